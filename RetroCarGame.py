@@ -1,24 +1,62 @@
+import time
+STARTED = time.perf_counter()  # Before the heavy imports, so they show up in the startup report
+
 import os
 import warnings
 import pygame
-import random
 import sys
-import uuid
-import json
+import atexit
+import numpy as np
+from asset_cache import AssetCache
+from biomes import BiomeStore
+from capture import FrameCapture
+from players import SAVE_FILE, open_repository
+from profiler import FrameProfiler
+from replay import Recorder
+from render import TextCache, DigitAtlas, Layer, DirtyRects, CrossFade, ListView, LowRes, scenery_strip
+from scheduler import FrameScheduler
+from score_service import ScoreClient, parse_address
+from simulation import (
+    WIDTH, HEIGHT, ROAD_X, ROAD_WIDTH, ROAD_SCROLL_SPEED, FPS,
+    CAR_WIDTH, CAR_HEIGHT, PLAYER_CAR_WIDTH, PLAYER_CAR_HEIGHT,
+    LANES, GameData, move, check_level_up
+)
 
 # Suppress warnings and pygame welcome message
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 warnings.filterwarnings("ignore", category=UserWarning, message="libpng warning: iCCP")
 
-# Initialize pygame
-pygame.init()
+def option(name, default=None):
+    """Value of a --name=value command-line option"""
+    for arg in sys.argv[1:]:
+        if arg.startswith(f"--{name}="):
+            return arg.split("=", 1)[1]
+    return default
+
+# Gameplay always advances in fixed steps of SIM_DT, drawing runs at the --fps rate
+SIM_DT = 1 / FPS
+MAX_FRAME_TIME = 0.25  # Longer hitches are not caught up on
+MAX_STEPS_PER_FRAME = 5
+# Main loop phases the profiler times, F3 toggles the overlay
+PROFILE_PHASES = ('events', 'scenery', 'enemies', 'level_up',
+                  'cars', 'upscale', 'hud', 'rank', 'menus', 'overlay', 'flip', 'capture')
+# Roadside x ranges the scenery sprites are scattered over, and the share of grid cells filled
+SCENERY_ZONES = ((10, ROAD_X - 10), (ROAD_X + ROAD_WIDTH + 10, WIDTH - 10))
+SCENERY_DENSITY = 0.4
+BIOME_FADE_STEPS = FPS * 4 // 5  # Cross-fade between biomes over 0.8 s of simulation
+# Art for each biome, cycling by level: background and the roadside sprite, sized or scaled
+BIOMES = [
+    {'background': "assets/CARS/bg.png", 'sprite': "assets/CARS/tree.png", 'scale': 2},
+    {'background': "assets/CARS/desertbg.png", 'sprite': "assets/CARS/desertRock.png", 'size': (69, 67)},
+    {'background': "assets/CARS/dirtbg.png", 'sprite': "assets/CARS/burned_tree.png", 'size': (48, 48)}
+]
+BIOME_MEMORY_MB = 8  # Resident baked biomes, about 1.7 MB each; --biome-memory=MB
+PREFETCH_POINTS = 5  # Start loading the next level's biome this many points before it
+IDLE_AFTER = 30  # Seconds without input before the menus stop scrolling, --idle-after=0 never stops them
+WELCOME_MS = 1500
+WELCOME_DONE = pygame.event.custom_type()  # Timer event that ends the welcome screen
+SCORES_UPDATED = pygame.event.custom_type()  # The score server answered a read late, lists show it
 
-# Game constants
-WIDTH, HEIGHT = 720, 600
-ROAD_X = 98
-ROAD_WIDTH = 350
-TREE_ZONE_WIDTH = 50
-ROAD_SCROLL_SPEED = 5
 COLORS = {
     'WHITE': (255, 255, 255),
     'BLACK': (0, 0, 0),
@@ -30,99 +68,81 @@ COLORS = {
     'ROAD': (50, 50, 50)
 }
 
-# Initialize screen
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("COUNTER FLOW")
-
 # Game state flags
 game_active = False
 difficulty_selection = False
 game_over = False
 show_welcome = False
-welcome_timer = 0
 show_leaderboard = False
 
 # Road animation variables
 road_y = 0
-CAR_WIDTH, CAR_HEIGHT = 40, 60
-PLAYER_CAR_WIDTH, PLAYER_CAR_HEIGHT = 64, 64
-SAVE_FILE = "players.json"
-
-def generate_uid():
-    return str(uuid.uuid4())
-
-def save_new_player(username="Player One"):
-    uid = generate_uid()
-    player_data = {"uid": uid, "username": username, "score": 0}
-    if os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, "r") as f:
-            data = json.load(f)
+biome_fade = CrossFade(BIOME_FADE_STEPS)  # Which biome is showing, and the fade into it
+REPLAY_DIR = "replays"
+
+# Filled in by main(), importing this module opens no window and touches no files
+screen = None
+assets = None
+game_data = None
+recorder = None
+score_digits = None
+enemy_sprites = None
+player_repo = None
+player = None
+biomes = None
+
+def init_display(vsync=False):
+    """Start only the subsystems the game uses (no audio, joysticks) and open the window"""
+    pygame.display.init()
+    pygame.font.init()
+    if vsync:
+        # SDL only honours vsync on a renderer-backed window
+        screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED, vsync=1)
     else:
-        data = {}
-    data[uid] = player_data
-    with open(SAVE_FILE, "w") as f:
-        json.dump(data, f)
-    return player_data
-
-def load_players():
-    if not os.path.exists(SAVE_FILE):
-        return {}
-    with open(SAVE_FILE, "r") as f:
-        return json.load(f)
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("COUNTER FLOW")
+    return screen
 
 def select_existing_player():
-    players = load_players()
-    if not players:
-        return None
     # For now, just pick the first player (no input UI)
-    first_uid = next(iter(players))
-    return players[first_uid]
+    return player_repo.first()
+
+def player_list_view(query=""):
+    """Players whose name starts with query, in name order"""
+    view = ListView(LIST_RECT, 40, lambda p: f"{p['username']} (High Score: {p['score']})")
+    view.set_source(player_repo.count(query), lambda start, stop: player_repo.find(query, start, stop))
+    return view
+
+def leaderboard_view(query=""):
+    """Every player by rank, or just those whose name starts with query with their ranks"""
+    view = ListView(LIST_RECT, 40, lambda entry: f"{entry[0]}. {entry[1]['username']} - {entry[1]['score']}")
+    if query:
+        view.set_source(player_repo.count(query),
+                        lambda start, stop: player_repo.find_ranked(query, start, stop))
+    else:
+        view.set_source(player_repo.count(), player_repo.ranked)
+    return view
+
+def edit_search(query, event):
+    """query after a KEYDOWN typed into a search box, or None if the key is not for it"""
+    if event.key == pygame.K_BACKSPACE:
+        return query[:-1]
+    if event.unicode and event.unicode.isprintable() and len(query) < SEARCH_LENGTH:
+        return query + event.unicode
+    return None
 
-def select_existing_player_menu(screen, font):
-    players = load_players()
-    if not players:
-        return None
-    player_list = list(players.values())
-    selected = 0
-    selecting = True
-    while selecting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP:
-                    selected = (selected - 1) % len(player_list)
-                elif event.key == pygame.K_DOWN:
-                    selected = (selected + 1) % len(player_list)
-                elif event.key == pygame.K_RETURN:
-                    return player_list[selected]
-
-        screen.fill((30, 30, 30))
-        title = font.render("Select Player", True, (255, 255, 255))
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 80))
-        for i, p in enumerate(player_list):
-            color = (255, 255, 0) if i == selected else (200, 200, 200)
-            txt = font.render(f"{p['username']} (High Score: {p['score']})", True, color)
-            screen.blit(txt, (WIDTH//2 - txt.get_width()//2, 150 + i*40))
-        pygame.display.flip()
+def draw_search_box(screen, font, query, count):
+    search = text_cache.render(font, f"Search: {query}_", (255, 255, 0))
+    screen.blit(search, (LIST_RECT.x, 120))
+    matches = text_cache.render(font, f"{count} players", (200, 200, 200))
+    screen.blit(matches, (LIST_RECT.right - matches.get_width(), 120))
 
-def save_player_score(uid, score):
-    if os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, "r") as f:
-            data = json.load(f)
-        if uid in data and score > data[uid]["score"]:
-            data[uid]["score"] = score
-            with open(SAVE_FILE, "w") as f:
-                json.dump(data, f)
-
-def get_player_rank(uid):
-    players = load_players()
-    scores = sorted([(p['uid'], p['score']) for p in players.values()], key=lambda x: x[1], reverse=True)
-    for idx, (pid, _) in enumerate(scores):
-        if pid == uid:
-            return idx + 1
-    return None
+def draw_player_select(screen, font, view, query):
+    screen.fill((30, 30, 30))
+    title = text_cache.render(font, "Select Player", (255, 255, 255))
+    screen.blit(title, (WIDTH//2 - title.get_width()//2, 60))
+    draw_search_box(screen, font, query, view.count)
+    view.draw(screen, font, text_cache, (200, 200, 200), (255, 255, 0))
 
 def create_default_car(color):
     """Create a simple car surface if assets are missing"""
@@ -138,16 +158,15 @@ def create_default_tree():
     pygame.draw.circle(tree, (0, 100, 0), (20, 30), 20)  # leaves
     return tree
 
-def load_assets():
+def load_assets(cache):
+    """Everything but the biomes, which the BiomeStore loads as they are needed"""
     assets = {
-        'background': None,
         'road': None,
         'player_car': create_default_car((0, 0, 255)),  # Blue player car
         'enemy_cars': {
             'down_left': None,  # Left lane (faster)
             'down_right': None  # Right lane (slower)
         },
-        'tree': create_default_tree(),
         'fonts': {
             'main': pygame.font.Font(None, 36),
             'large': pygame.font.Font(None, 50),
@@ -158,37 +177,14 @@ def load_assets():
     
     try:
         # Try loading actual assets
-        assets['background'] = pygame.image.load("assets/CARS/bg.png").convert()
-        assets['background'] = pygame.transform.scale(assets['background'], (WIDTH, HEIGHT))
-        assets['desertbg'] = pygame.image.load("assets/CARS/desertbg.png").convert()
-        assets['desertbg'] = pygame.transform.scale(assets['desertbg'], (WIDTH, HEIGHT))
-        assets['dirtbg'] = pygame.image.load("assets/CARS/dirtbg.png").convert()
-        assets['dirtbg'] = pygame.transform.scale(assets['dirtbg'], (WIDTH, HEIGHT))
-        assets['road'] = pygame.image.load("assets/CARS/road.png").convert_alpha()
-        assets['road'] = pygame.transform.scale(assets['road'], (ROAD_WIDTH, HEIGHT))
-        tree_img = pygame.image.load("assets/CARS/tree.png").convert_alpha()
-        tree_width, tree_height = tree_img.get_width(), tree_img.get_height()
-        scale_factor = 2  # Change this to make it bigger or smaller
-        assets['tree'] = pygame.transform.scale(tree_img, (tree_width * scale_factor, tree_height * scale_factor))
-        assets['desert_rock'] = pygame.transform.scale(
-            pygame.image.load("assets/CARS/desertRock.png").convert_alpha(),
-            (69, 67)  # Use the actual size or scale as needed
-        )
-        assets['burned_tree'] = pygame.transform.scale(
-            pygame.image.load("assets/CARS/burned_tree.png").convert_alpha(),
-            (48, 48)  # Use the actual size or scale as needed
-        )
-        
+        # Images come converted and scaled from the on-disk cache after the first launch
+        assets['road'] = cache.image("assets/CARS/road.png", (ROAD_WIDTH, HEIGHT))
         # Load actual car images if available
-        player_img = pygame.image.load("assets/CARS/maincarLOw.png").convert_alpha()
-        assets['player_car'] = pygame.transform.scale(player_img, (PLAYER_CAR_WIDTH, PLAYER_CAR_HEIGHT))
+        assets['player_car'] = cache.image("assets/CARS/maincarLOw.png", (PLAYER_CAR_WIDTH, PLAYER_CAR_HEIGHT))
         
         # Load enemy cars - different images for left and right lanes
-        enemy_down_left = pygame.image.load("assets/CARS/car-enemy2.png").convert_alpha()
-        assets['enemy_cars']['down_left'] = pygame.transform.scale(enemy_down_left, (CAR_WIDTH, CAR_HEIGHT))
-        
-        enemy_down_right = pygame.image.load("assets/CARS/car-enemy.png").convert_alpha()
-        assets['enemy_cars']['down_right'] = pygame.transform.scale(enemy_down_right, (CAR_WIDTH, CAR_HEIGHT))
+        assets['enemy_cars']['down_left'] = cache.image("assets/CARS/car-enemy2.png", (CAR_WIDTH, CAR_HEIGHT))
+        assets['enemy_cars']['down_right'] = cache.image("assets/CARS/car-enemy.png", (CAR_WIDTH, CAR_HEIGHT))
         
         # Try loading fonts
         assets['fonts']['main'] = pygame.font.Font("assets/fonts/PixelifySans-Bold.ttf", 36)
@@ -203,155 +199,174 @@ def load_assets():
     
     return assets
 
-class Tree:
-    def __init__(self, side, image_key='tree'):
-        self.side = side  # 'left' or 'right'
-        self.image_key = image_key
-        self.image = assets[self.image_key]
-        self.rect = self.image.get_rect()
-        self.reset()
-        
-    def set_image(self, image_key):
-        self.image_key = image_key
-        self.image = assets[self.image_key]
-        old_pos = self.rect.topleft
-        self.rect = self.image.get_rect()
-        self.rect.topleft = old_pos
-
-    def reset(self):
-        self.rect.y = random.randint(-HEIGHT, -100)
-        if self.side == 'left':
-            self.rect.x = random.randint(10, ROAD_X - TREE_ZONE_WIDTH)
-        else:
-            self.rect.x = random.randint(ROAD_X + ROAD_WIDTH + 10, WIDTH - 50)
-
-    def update(self):
-        self.rect.y += ROAD_SCROLL_SPEED
-        if self.rect.top > HEIGHT:
-            self.reset()
-
-class GameData:
-    def __init__(self):
-        self.reset()
-        
-    def reset(self):
-        self.current_level = 0
-        self.player_speed = 5
-        self.enemy_speed_left = 6
-        self.enemy_speed_right = 2
-        self.base_min_cars = 2
-        self.base_max_cars = 3
-        self.score = 0
-        self.enemy_cars = []
-        self.trees = []
-        self.just_leveled_up = False
-
-        self.player_rect = pygame.Rect(
-            ROAD_X + (ROAD_WIDTH // 2) - (CAR_WIDTH // 2),
-            HEIGHT - 120,
-            CAR_WIDTH,
-            CAR_HEIGHT
-        )
-
-        # Improved tree placement
-        tree_positions = []
-        min_distance = 60  # Minimum distance between trees
-        tree_width = assets['tree'].get_width()
-        tree_height = assets['tree'].get_height()
-
-        def valid_tree_pos(x, y, side):
-            # Avoid road area
-            if side == 'left' and (x + tree_width > ROAD_X - 5):
-                return False
-            if side == 'right' and (x < ROAD_X + ROAD_WIDTH + 5):
-                return False
-            # Avoid overlap with other trees
-            for tx, ty in tree_positions:
-                if abs(x - tx) < min_distance and abs(y - ty) < min_distance:
-                    return False
-            return True
-
-        # Place left trees
-        for _ in range(4):
-            placed = False
-            attempts = 0
-            while not placed and attempts < 100:
-                x = random.randint(10, ROAD_X - tree_width - 10)
-                y = random.randint(-HEIGHT, HEIGHT - tree_height)
-                if valid_tree_pos(x, y, 'left'):
-                    tree_positions.append((x, y))
-                    t = Tree('left')
-                    t.rect.x = x
-                    t.rect.y = y
-                    self.trees.append(t)
-                    placed = True
-                attempts += 1
-
-        # Place right trees
-        for _ in range(4):
-            placed = False
-            attempts = 0
-            while not placed and attempts < 100:
-                x = random.randint(ROAD_X + ROAD_WIDTH + 10, WIDTH - tree_width - 10)
-                y = random.randint(-HEIGHT, HEIGHT - tree_height)
-                if valid_tree_pos(x, y, 'right'):
-                    tree_positions.append((x, y))
-                    t = Tree('right')
-                    t.rect.x = x
-                    t.rect.y = y
-                    self.trees.append(t)
-                    placed = True
-                attempts += 1
-
-        self.setup_level()
-
-    def setup_level(self):
-        # Cars increase every 5 levels
-        extra_cars = self.current_level // 5
-        min_cars = self.base_min_cars + extra_cars
-        max_cars = self.base_max_cars + extra_cars
-
-        # Speed increases by 10% per level
-        self.enemy_speed_left = 6 * (2.2 ** self.current_level)
-        self.enemy_speed_right = 2 * (2.2 ** self.current_level)
-
-        self.enemy_cars = []
-        left_lane = ROAD_X
-        right_lane = ROAD_X + ROAD_WIDTH - CAR_WIDTH
-        mid_point = ROAD_X + (ROAD_WIDTH // 2) - (CAR_WIDTH // 2)
-
-        for _ in range(random.randint(min_cars, max_cars)):
-            if random.random() < 0.5:
-                x_pos = random.randint(left_lane, mid_point - 10)
-                speed = self.enemy_speed_left
-                sprite = assets['enemy_cars']['down_left']
-            else:
-                x_pos = random.randint(mid_point + 10, right_lane)
-                speed = self.enemy_speed_right
-                sprite = assets['enemy_cars']['down_right']
-
-            enemy_rect = pygame.Rect(
-                x_pos,
-                random.randint(-300, -50),
-                CAR_WIDTH,
-                CAR_HEIGHT
-            )
-            self.enemy_cars.append((enemy_rect, sprite, speed))
-
-def simple_collision(rect1, rect2):
-    """Simpler collision detection using rects only"""
-    return rect1.colliderect(rect2)
+def load_biome(cache, index):
+    """Baked scenery strip of one biome, its source images are only needed while baking"""
+    spec = BIOMES[index]
+    try:
+        background = cache.image(spec['background'], (WIDTH, HEIGHT), alpha=False)
+        sprite = cache.image(spec['sprite'], spec.get('size'), scale=spec.get('scale', 1))
+    except Exception as e:
+        print(f"Biome asset loading error: {e}, using default scenery")
+        background, sprite = None, create_default_tree()
+    return bake_scenery(background, sprite, index)
+
+def bake_scenery(background, sprite, seed):
+    """Background, roadside sprites and road of one biome as a single strip, scrolled whole each frame"""
+    if background is None:
+        background = pygame.Surface((WIDTH, HEIGHT))
+        background.fill(COLORS['BLACK'])
+    strip = scenery_strip(background, sprite, SCENERY_ZONES, SCENERY_DENSITY, seed=seed)
+    if assets['road']:
+        strip.blit(assets['road'], (ROAD_X, 0))
+    else:
+        pygame.draw.rect(strip, COLORS['ROAD'], ROAD_RECT)
+        # Draw road markings
+        for y_pos in range(0, HEIGHT, 50):
+            pygame.draw.rect(strip, COLORS['YELLOW'], (ROAD_X + ROAD_WIDTH//2 - 5, y_pos, 10, 30))
+    return strip
+
+def biome(level):
+    """(index, scenery strip) for a level, the biome already showing until that one has loaded"""
+    index = level % len(BIOMES)
+    strip = biomes.get(index)
+    if strip is None and biome_fade.current is not None:
+        strip = biomes.get(biome_fade.current)
+        if strip is not None:
+            index = biome_fade.current
+    if strip is None:
+        strip = biomes.require(index)  # Nothing on screen yet to keep showing
+    return index, strip
+
+def start_welcome(new_player):
+    """Greet new_player, the difficulty menu follows on a key or after WELCOME_MS"""
+    global player, show_welcome
+    player = new_player
+    game_data.reset()
+    show_welcome = True
+    pygame.time.set_timer(WELCOME_DONE, WELCOME_MS, loops=1)
 
 def handle_difficulty(level):
-    global game_active, difficulty_selection
+    global game_active, difficulty_selection, recorder
     game_data.difficulty = level
     game_data.reset()
+    recorder = Recorder(game_data)
     game_active = True
     difficulty_selection = False
 
-def draw_text(text, font, color, x, y):
-    text_surf = font.render(text, True, color)
-    screen.blit(text_surf, text_surf.get_rect(center=(x, y)))
+def save_recording(recorder):
+    """Write the finished session's inputs so it can be replayed and checked"""
+    try:
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        path = os.path.join(REPLAY_DIR, f"{player['uid'][:8]}-{recorder.seed:08x}.rcr")
+        recorder.save(path, game_data)
+    except OSError as e:
+        print(f"Replay save error: {e}")
+
+def capture_positions():
+    """Positions the renderer blends from, taken before each simulation step"""
+    enemies = game_data.enemies
+    return (
+        road_y,
+        game_data.player_rect.x,
+        (enemies.x.copy(), enemies.y.copy())
+    )
+
+def blend(prev, cur, alpha):
+    """Position between two simulation steps, jumps backwards (respawns) snap to cur"""
+    if cur < prev:
+        return cur
+    return prev + (cur - prev) * alpha
+
+def blend_positions(prev, x, y, alpha):
+    """blend() over entity columns (lists or arrays), anything that respawned (moved sideways or back up) snaps"""
+    prev_x, prev_y = prev
+    x, y = np.asarray(x), np.asarray(y)
+    if len(prev_x) != len(x):
+        return x.tolist(), y.tolist()  # New level, nothing to blend from
+    snap = (prev_x != x) | (y < prev_y)
+    return x.tolist(), np.where(snap, y, prev_y + (y - prev_y) * alpha).tolist()
+
+def advance_world(profiler, playing=False, left=False, right=False):
+    """One fixed step of the scrolling scenery and, while playing, the game; returns True on a crash"""
+    global road_y
+    # Road and scenery scroll together
+    road_y = (road_y + ROAD_SCROLL_SPEED) % HEIGHT
+    biome_fade.update()
+    profiler.mark('scenery')
+
+    if not playing:
+        return False
+    recorder.add(left, right)
+    crashed = move(game_data, left, right)
+    profiler.mark('enemies')
+    check_level_up(game_data)
+    # The next level's biome loads in the background while the player closes in on it
+    if game_data.score % game_data.level_score >= game_data.level_score - PREFETCH_POINTS:
+        biomes.prefetch((game_data.current_level + 1) % len(BIOMES))
+    profiler.mark('level_up')
+    return crashed
+
+def draw_world(screen, previous, alpha, dirty, profiler):
+    """Scenery strip of the current biome blended between the last two steps, returns the biome shown"""
+    prev_road_y = previous[0]
+
+    # Normally two opaque blits of the pre-baked strip, however much scenery it holds
+    bg_index, strip = biome(game_data.current_level)
+    biome_fade.show(bg_index)  # A new biome starts fading in, advance_world steps it
+    draw_road_y = blend(prev_road_y - HEIGHT if road_y < prev_road_y else prev_road_y, road_y, alpha)
+    fade = biome_fade.amount(alpha)
+    old_strip = biomes.get(biome_fade.previous) if fade < 1 else None
+    if old_strip is not None:
+        # Mid-change: the old biome underneath, the new one over it with surface alpha,
+        # both straight from their cached strips
+        screen.blit(old_strip, (0, draw_road_y))
+        screen.blit(old_strip, (0, draw_road_y - HEIGHT))
+        strip.set_alpha(round(fade * 255))
+        screen.blit(strip, (0, draw_road_y))
+        screen.blit(strip, (0, draw_road_y - HEIGHT))
+        strip.set_alpha(None)
+        dirty.full()
+    else:
+        screen.blit(strip, (0, draw_road_y))
+        screen.blit(strip, (0, draw_road_y - HEIGHT))
+        dirty.scrolled(strip, getattr(screen, 'factor', 1))
+    profiler.mark('scenery')
+    return bg_index
+
+def draw_cars(screen, previous, alpha, dirty, profiler):
+    """Player and enemy cars blended between the last two steps"""
+    _, prev_player_x, prev_enemies = previous
+
+    # Draw vehicles
+    player_rect = game_data.player_rect
+    dirty.add(screen.blit(assets['player_car'], (prev_player_x + (player_rect.x - prev_player_x) * alpha, player_rect.y)))
+    enemies = game_data.enemies
+    enemy_x, enemy_y = blend_positions(prev_enemies, enemies.x, enemies.y, alpha)
+    dirty.extend(screen.blits([(enemy_sprites[sprite], pos)
+                               for sprite, pos in zip(enemies.sprite, zip(enemy_x, enemy_y))],
+                              doreturn=dirty.enabled) or ())
+    profiler.mark('cars')
+
+def draw_hud(screen, dirty, profiler):
+    """Score, level, manual and player info, drawn at full resolution over the scene"""
+    # Display score and level, score digits come from the glyph atlas
+    score_text = text_cache.render(assets['fonts']['score'], "SCORE: ", COLORS['WHITE'])
+    dirty.add(screen.blit(score_text, (20, 20)))
+    dirty.add(score_digits.draw(screen, game_data.score, (20 + score_text.get_width(), 20)))
+
+    level_text = text_cache.render(assets['fonts']['score'], f"LEVEL: {game_data.current_level + 1}", COLORS['WHITE'])
+    dirty.add(screen.blit(level_text, (20, 60)))
+
+    # Only show manual panel if level is less than 2 (current_level < 1 means level 1)
+    if game_data.current_level < 1:
+        draw_manual_panel(screen, assets['fonts']['main'])
+
+    profiler.mark('hud')
+    rank = player_repo.rank(player['uid'])
+    profiler.mark('rank')
+    for rect in draw_top_right_info(screen, assets['fonts']['main'], player['username'], game_data.score, player['score'], rank):
+        dirty.add(rect)
+    profiler.mark('hud')
 
 def create_button(text, x, y, w, h, color):
     return {
@@ -360,11 +375,44 @@ def create_button(text, x, y, w, h, color):
         'text': text
     }
 
-def draw_manual_panel(screen, font):
+def build_button(btn, font):
+    """Button background and label pre-composed on one surface"""
+    surf = pygame.Surface(btn['rect'].size, pygame.SRCALPHA)
+    pygame.draw.rect(surf, btn['color'], surf.get_rect(), border_radius=10)
+    label = text_cache.render(font, btn['text'], COLORS['BLACK'])
+    surf.blit(label, label.get_rect(center=surf.get_rect().center))
+    return surf
+
+def build_menu_layer(texts, buttons, button_font):
+    """(surface, position) pairs for a menu screen, ready for screen.blits"""
+    parts = []
+    for text, font, color, center in texts:
+        surf = text_cache.render(font, text, color)
+        parts.append((surf, surf.get_rect(center=center)))
+    for btn in buttons:
+        parts.append((build_button(btn, button_font), btn['rect']))
+    return parts
+
+def build_main_menu(large_font, main_font):
+    return build_menu_layer([
+        ("COUNTER FLOW", large_font, COLORS['WHITE'], (WIDTH//2, 150)),
+        ("Avoid the oncoming traffic!", main_font, COLORS['RED'], (WIDTH//2, 200))
+    ], MENU_BUTTONS, main_font)
+
+def build_difficulty_menu(large_font, main_font):
+    return build_menu_layer([
+        ("SELECT DIFFICULTY", large_font, COLORS['WHITE'], (WIDTH//2, 150))
+    ], DIFFICULTY_BUTTONS, main_font)
+
+def build_game_over_menu(large_font, main_font, score):
+    return build_menu_layer([
+        ("GAME OVER", large_font, COLORS['RED'], (WIDTH//2, 150)),
+        (f"SCORE: {score}", main_font, COLORS['WHITE'], (WIDTH//2, 220))
+    ], GAME_OVER_BUTTONS, main_font)
+
+def build_manual_panel(tiny_font):
     panel_width = 250
     panel_height = 180
-    panel_x = WIDTH - panel_width - 20
-    panel_y = 400
     panel_color = (30, 30, 30, 200)  # RGBA for transparency
 
     # Create a semi-transparent surface
@@ -380,341 +428,447 @@ def draw_manual_panel(screen, font):
         "Collect power-ups",
         "Level up at milestones"
     ]
-    # Use the tiny font from assets
-    tiny_font = assets['fonts']['tiny']
     for i, line in enumerate(manual_text):
-        text = tiny_font.render(line, True, (255, 255, 255))
+        text = text_cache.render(tiny_font, line, (255, 255, 255))
         panel_surface.blit(text, (12, 10 + i * 24))  # Adjust line spacing for tiny font
+    return panel_surface
 
-    screen.blit(panel_surface, (panel_x, panel_y))
+def draw_manual_panel(screen, font):
+    # Use the tiny font from assets
+    panel_surface = manual_layer.get(assets['fonts']['tiny'])
+    screen.blit(panel_surface, (WIDTH - panel_surface.get_width() - 20, 400))
+
+def build_pause_overlay(size, large_font, main_font):
+    width, height = size
+    overlay = pygame.Surface(size, pygame.SRCALPHA)
+    overlay.fill((0, 0, 0, 180))
+    pause_text = text_cache.render(large_font, "PAUSED", COLORS['YELLOW'])
+    overlay.blit(pause_text, (width//2 - pause_text.get_width()//2, height//2 - 40))
+    skip_text = text_cache.render(main_font, "Press S to skip", COLORS['WHITE'])
+    overlay.blit(skip_text, (width//2 - skip_text.get_width()//2, height//2 + 30))
+    return overlay
+
+def draw_pause(screen, frame):
+    """Pause overlay over the frame that was showing, so redrawing it never darkens it further"""
+    screen.blit(frame, (0, 0))
+    screen.blit(pause_layer.get(screen.get_size(), assets['fonts']['large'], assets['fonts']['main']), (0, 0))
+
+def build_profiler_overlay(font, summary):
+    """Table of rolling p50/p99 frame times per phase"""
+    line_height = font.get_linesize()
+    surf = pygame.Surface((210, line_height * (len(summary) + 1) + 10), pygame.SRCALPHA)
+    surf.fill((0, 0, 0, 190))
+    rows = [("phase", "p50 ms", "p99 ms")] + [(phase, f"{p50:.2f}", f"{p99:.2f}") for phase, p50, p99 in summary]
+    for i, (phase, p50, p99) in enumerate(rows):
+        y = 5 + i * line_height
+        color = COLORS['YELLOW'] if i == 0 or phase in ('busy', 'total') else COLORS['WHITE']
+        surf.blit(text_cache.render(font, phase, color), (8, y))
+        for text, right in ((p50, 140), (p99, 202)):
+            label = text_cache.render(font, text, color)
+            surf.blit(label, (right - label.get_width(), y))
+    return surf
+
+def draw_profiler_overlay(screen, font, profiler):
+    if not profiler.summary:
+        return None
+    return screen.blit(profiler_layer.get(font, tuple(profiler.summary)), (10, 100))
+
+def build_welcome(size, username, large_font, main_font):
+    width, height = size
+    surf = pygame.Surface(size)
+    surf.fill((30, 30, 30))
+    banner = text_cache.render(large_font, f"Welcome, {username}!", COLORS['YELLOW'])
+    surf.blit(banner, (width//2 - banner.get_width()//2, height//2 - 60))
+    info = text_cache.render(main_font, "Press any key to continue...", COLORS['WHITE'])
+    surf.blit(info, (width//2 - info.get_width()//2, height//2 + 10))
+    return surf
 
 def draw_top_right_info(screen, font, username, score, high_score, rank):
-    text1 = font.render(username, True, (255, 255, 255))
-    text2 = font.render(f"High Score: {high_score}", True, (255, 255, 255))
-    text3 = font.render(f"Rank: {rank}", True, (255, 255, 255))
-    screen.blit(text1, (screen.get_width() - text1.get_width() - 10, 10))
-    screen.blit(text2, (screen.get_width() - text2.get_width() - 10, 40))
-    screen.blit(text3, (screen.get_width() - text3.get_width() - 10, 70))
-
-def get_username_input(screen, font):
-    username = ""
-    input_active = True
-    while input_active:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN and username.strip():
-                    input_active = False
-                elif event.key == pygame.K_BACKSPACE:
-                    username = username[:-1]
-                elif len(username) < 12 and event.unicode.isprintable():
-                    username += event.unicode
-
-        screen.fill((30, 30, 30))
-        prompt = font.render("Enter Username:", True, (255, 255, 255))
-        usertxt = font.render(username, True, (255, 255, 0))
-        screen.blit(prompt, (WIDTH//2 - prompt.get_width()//2, HEIGHT//2 - 60))
-        screen.blit(usertxt, (WIDTH//2 - usertxt.get_width()//2, HEIGHT//2))
-        pygame.display.flip()
-    return username.strip()
+    text1 = text_cache.render(font, username, (255, 255, 255))
+    text2 = text_cache.render(font, f"High Score: {high_score}", (255, 255, 255))
+    text3 = text_cache.render(font, f"Rank: {rank}", (255, 255, 255))
+    return [
+        screen.blit(text1, (screen.get_width() - text1.get_width() - 10, 10)),
+        screen.blit(text2, (screen.get_width() - text2.get_width() - 10, 40)),
+        screen.blit(text3, (screen.get_width() - text3.get_width() - 10, 70))
+    ]
+
+def draw_name_entry(screen, font, username):
+    screen.fill((30, 30, 30))
+    prompt = text_cache.render(font, "Enter Username:", (255, 255, 255))
+    usertxt = text_cache.render(font, username, (255, 255, 0))
+    screen.blit(prompt, (WIDTH//2 - prompt.get_width()//2, HEIGHT//2 - 60))
+    screen.blit(usertxt, (WIDTH//2 - usertxt.get_width()//2, HEIGHT//2))
 
-def draw_leaderboard(screen, font):
-    players = load_players()
-    sorted_players = sorted(players.values(), key=lambda p: p['score'], reverse=True)
+def draw_leaderboard(screen, font, view, query):
     screen.fill((30, 30, 30))
-    title = font.render("LEADERBOARD", True, (255, 215, 0))
+    title = text_cache.render(font, "LEADERBOARD", (255, 215, 0))
     screen.blit(title, (WIDTH//2 - title.get_width()//2, 60))
-    for i, p in enumerate(sorted_players[:10]):
-        entry = font.render(f"{i+1}. {p['username']} - {p['score']}", True, (255, 255, 255))
-        screen.blit(entry, (WIDTH//2 - entry.get_width()//2, 120 + i*40))
-    info = font.render("Press ESC to return", True, (200, 200, 200))
+    draw_search_box(screen, font, query, view.count)
+    view.draw(screen, font, text_cache, (255, 255, 255), (255, 215, 0))
+    info = text_cache.render(font, "Press ESC to return", (200, 200, 200))
     screen.blit(info, (WIDTH//2 - info.get_width()//2, HEIGHT - 60))
-    pygame.display.flip()
-
-def fade_transition(screen, from_bg, to_bg, duration=800):
-    clock = pygame.time.Clock()
-    steps = 30
-    for alpha in range(0, 256, int(255/steps)):
-        temp = to_bg.copy()
-        temp.set_alpha(alpha)
-        screen.blit(from_bg, (0, 0))
-        screen.blit(temp, (0, 0))
-        pygame.display.flip()
-        clock.tick(steps / (duration / 1000))
-
-# Initialize game data
-assets = load_assets()
-game_data = GameData()
-BG_SEQUENCE = [assets['background'], assets['desertbg'], assets['dirtbg']]
 
-# Player system: load or create
-if os.path.exists(SAVE_FILE):
+text_cache = TextCache()
+
+# Menu buttons, created once and shared by the layers and hit testing
+new_btn = create_button("NEW GAME", WIDTH//2-100, 300, 200, 50, COLORS['GREEN'])
+load_btn = create_button("LOAD GAME", WIDTH//2-100, 370, 200, 50, COLORS['YELLOW'])
+leaderboard_btn = create_button("LEADERBOARD", WIDTH//2-125, 440, 250, 50, COLORS['ORANGE'])
+MENU_BUTTONS = [new_btn, load_btn, leaderboard_btn]
+DIFFICULTY_BUTTONS = [
+    create_button("EASY", WIDTH//2-100, 250, 200, 50, COLORS['GREEN']),
+    create_button("MEDIUM", WIDTH//2-100, 320, 200, 50, COLORS['YELLOW']),
+    create_button("HARD", WIDTH//2-100, 390, 200, 50, COLORS['RED'])
+]
+play_again_btn = create_button("PLAY AGAIN", WIDTH//2-100, 300, 200, 50, COLORS['GREEN'])
+quit_btn = create_button("QUIT", WIDTH//2-100, 370, 200, 50, COLORS['RED'])
+GAME_OVER_BUTTONS = [play_again_btn, quit_btn]
+
+# Static screen compositions, rebuilt only when their inputs change
+menu_layer = Layer(build_main_menu)
+difficulty_layer = Layer(build_difficulty_menu)
+game_over_layer = Layer(build_game_over_menu)
+manual_layer = Layer(build_manual_panel)
+pause_layer = Layer(build_pause_overlay)
+welcome_layer = Layer(build_welcome)
+profiler_layer = Layer(build_profiler_overlay)
+ROAD_RECT = pygame.Rect(ROAD_X, 0, ROAD_WIDTH, HEIGHT)
+LIST_RECT = pygame.Rect(WIDTH//2 - 300, 170, 600, 360)  # Player select and leaderboard rows
+SEARCH_LENGTH = 12  # Usernames are at most this long
+
+def main():
+    global screen, assets, game_data, recorder, score_digits, enemy_sprites, player_repo, player, biomes
+    global game_active, difficulty_selection, game_over, show_welcome, show_leaderboard, road_y
+    render_fps = int(option('fps', FPS))  # 0 = uncapped
+    # Opt-in: push only changed screen areas instead of flipping the whole display
+    dirty_rects = '--dirty-rects' in sys.argv
+    # --profile starts with the timing overlay up, --trace=FILE.csv/.jsonl records every frame
+    profiler = FrameProfiler(PROFILE_PHASES, trace_path=option('trace'))
+    profiler.overlay = '--profile' in sys.argv
+    # --capture=DIR writes a PNG sequence, --capture=FILE.raw raw rgb24 frames; F9 pauses it
+    capture = None
+    if option('capture'):
+        capture = FrameCapture(option('capture'), stride=int(option('capture-stride', 1)),
+                               fps=render_fps or FPS)
+    timings = []  # (phase, ms) for the startup report
+    phase_start = STARTED
+
+    def phase(name):
+        nonlocal phase_start
+        now = time.perf_counter()
+        timings.append((name, (now - phase_start) * 1000))
+        phase_start = now
+
+    phase("imports")
+    screen = init_display(vsync='--vsync' in sys.argv)
+    # --low-res composes the scrolling scene at half resolution (--low-res=N: 1/N) and
+    # scales it up to the window, the HUD and menus stay sharp; F4 switches at runtime
+    try:
+        low_res = LowRes((WIDTH, HEIGHT), int(option('low-res', 2)))
+    except ValueError as e:
+        print(f"Low resolution error: {e}, using half resolution")
+        low_res = LowRes((WIDTH, HEIGHT))
+    scaled = '--low-res' in sys.argv or option('low-res') is not None
+    phase("display")
+
+    # Only what the menu and the first level draw is loaded up front, the other biomes
+    # load in the background as they are needed and the least recently shown are dropped
+    asset_cache = AssetCache()
+    assets = load_assets(asset_cache)
+    enemy_sprites = [assets['enemy_cars'][lane] for lane in LANES]  # Indexed by sprite id
+    score_digits = DigitAtlas(assets['fonts']['score'], COLORS['WHITE'])
+    biomes = BiomeStore(lambda index: load_biome(asset_cache, index),
+                        int(float(option('biome-memory', BIOME_MEMORY_MB)) * 2**20))
+    biomes.require(0)
+    phase("assets")
+
+    game_data = GameData()
+    recorder = Recorder(game_data)
+    phase("game data")
+
+    # Player system: load or create
+    # --players=players.db keeps them in a SQLite database several cabinets can share,
+    # --score-server=HOST:PORT uses a score_service.py server instead of local storage
+    if option('score-server'):
+        player_repo = ScoreClient(*parse_address(option('score-server')),
+                                  on_update=lambda: pygame.event.post(pygame.event.Event(SCORES_UPDATED)))
+    else:
+        player_repo = open_repository(option('players', SAVE_FILE))
+    atexit.register(player_repo.close)
     player = select_existing_player()
     if player is None:
-        player = save_new_player()
-else:
-    player = save_new_player()
-
-# Main game loop
-running = True
-clock = pygame.time.Clock()
-manual_shown = False  # Add this flag
-paused = False
-
-while running:
-    mouse_pos = pygame.mouse.get_pos()
-    mouse_click = False
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            mouse_click = True
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_p and game_active:
-                paused = not paused
-            if paused and event.key == pygame.K_s:
-                paused = False  # "Skip" resumes the game
-
-    # --- PAUSE CHECK: Do this BEFORE any game logic or drawing ---
-    if paused:
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        screen.blit(overlay, (0, 0))
-        pause_text = assets['fonts']['large'].render("PAUSED", True, COLORS['YELLOW'])
-        screen.blit(pause_text, (WIDTH//2 - pause_text.get_width()//2, HEIGHT//2 - 40))
-        skip_text = assets['fonts']['main'].render("Press S to skip", True, COLORS['WHITE'])
-        screen.blit(skip_text, (WIDTH//2 - skip_text.get_width()//2, HEIGHT//2 + 30))
+        player = player_repo.new_player()
+    phase("players")
+
+    # Main game loop
+    running = True
+    # Frames at render_fps while the road scrolls, a sleep until input on the static screens
+    scheduler = FrameScheduler(render_fps, idle_after=float(option('idle-after', IDLE_AFTER)))
+    manual_shown = False  # Add this flag
+    paused = False
+    pause_frame = None  # What was showing when the game was paused
+    dirty = DirtyRects(dirty_rects)
+    last_view = None
+    entering_name, username = False, ""
+    player_select, player_query = None, ""  # The player select screen's list while it is open
+    leaderboard, leaderboard_query = None, ""
+    accumulator = 0.0
+    last_time = time.perf_counter()
+    previous = capture_positions()
+    first_frame = True
+
+    def present_static():
+        """Show a static screen just drawn, it stays up while the loop sleeps"""
+        profiler.mark('menus')
         pygame.display.flip()
-        clock.tick(10)
-        continue  # Skip the rest of the loop, so nothing moves/updates
-
-    # --- All your game logic and drawing below here ---
-    # Update road animation, draw background, trees, road, game states, etc.
-
-    # Update road animation
-    road_y = (road_y + ROAD_SCROLL_SPEED) % HEIGHT
-
-    # Choose background based on level
-    bg_index = game_data.current_level % len(BG_SEQUENCE)
-    bg = BG_SEQUENCE[bg_index]
-    screen.blit(bg, (0, 0))
-
-    # Set tree image depending on background
-    if bg_index == 0:
-        tree_key = 'tree'
-    elif bg_index == 1:
-        tree_key = 'desert_rock'
-    else:
-        tree_key = 'burned_tree'
-
-    for tree in game_data.trees:
-        tree.set_image(tree_key)
-        tree.update()
-        screen.blit(tree.image, tree.rect)
-
-    # Draw road
-    if assets['road']:
-        screen.blit(assets['road'], (ROAD_X, road_y))
-        screen.blit(assets['road'], (ROAD_X, road_y - HEIGHT))
-    else:
-        pygame.draw.rect(screen, COLORS['ROAD'], (ROAD_X, 0, ROAD_WIDTH, HEIGHT))
-        # Draw road markings
-        for i in range(-1, HEIGHT//50 + 1):
-            y_pos = (i * 50 + road_y) % HEIGHT
-            pygame.draw.rect(screen, COLORS['YELLOW'], (ROAD_X + ROAD_WIDTH//2 - 5, y_pos, 10, 30))
-
-    # Game states
-    # Main menu state
-    if not game_active and not difficulty_selection and not game_over and not show_leaderboard:
-        draw_text("COUNTER FLOW", assets['fonts']['large'], COLORS['WHITE'], WIDTH//2, 150)
-        draw_text("Avoid the oncoming traffic!", assets['fonts']['main'], COLORS['RED'], WIDTH//2, 200)
-
-        new_btn = create_button("NEW GAME", WIDTH//2-100, 300, 200, 50, COLORS['GREEN'])
-        load_btn = create_button("LOAD GAME", WIDTH//2-100, 370, 200, 50, COLORS['YELLOW'])
-        leaderboard_btn = create_button("LEADERBOARD", WIDTH//2-125, 440, 250, 50, COLORS['ORANGE'])
-
-        pygame.draw.rect(screen, new_btn['color'], new_btn['rect'], border_radius=10)
-        draw_text(new_btn['text'], assets['fonts']['main'], COLORS['BLACK'], new_btn['rect'].centerx, new_btn['rect'].centery)
-        pygame.draw.rect(screen, load_btn['color'], load_btn['rect'], border_radius=10)
-        draw_text(load_btn['text'], assets['fonts']['main'], COLORS['BLACK'], load_btn['rect'].centerx, load_btn['rect'].centery)
-        pygame.draw.rect(screen, leaderboard_btn['color'], leaderboard_btn['rect'], border_radius=10)
-        draw_text(leaderboard_btn['text'], assets['fonts']['main'], COLORS['BLACK'], leaderboard_btn['rect'].centerx, leaderboard_btn['rect'].centery)
-
-        if mouse_click:
-            if new_btn['rect'].collidepoint(mouse_pos):
-                username = get_username_input(screen, assets['fonts']['main'])
-                player = save_new_player(username)
-                game_data.reset()
-                show_welcome = True
-                welcome_timer = pygame.time.get_ticks()
-                game_active = False
-                difficulty_selection = False
-            elif load_btn['rect'].collidepoint(mouse_pos):
-                loaded = select_existing_player_menu(screen, assets['fonts']['main'])
-                if loaded:
-                    player = loaded
-                    game_data.reset()
-                    show_welcome = True
-                    welcome_timer = pygame.time.get_ticks()
-                    game_active = False
-                    difficulty_selection = False
-            elif leaderboard_btn['rect'].collidepoint(mouse_pos):
-                show_leaderboard = True
-
-    elif difficulty_selection:
-        # Difficulty selection
-        draw_text("SELECT DIFFICULTY", assets['fonts']['large'], COLORS['WHITE'], WIDTH//2, 150)
-        
-        buttons = [
-            create_button("EASY", WIDTH//2-100, 250, 200, 50, COLORS['GREEN']),
-            create_button("MEDIUM", WIDTH//2-100, 320, 200, 50, COLORS['YELLOW']),
-            create_button("HARD", WIDTH//2-100, 390, 200, 50, COLORS['RED'])
-        ]
-        
-        for i, btn in enumerate(buttons):
-            pygame.draw.rect(screen, btn['color'], btn['rect'], border_radius=10)
-            draw_text(btn['text'], assets['fonts']['main'], COLORS['BLACK'], btn['rect'].centerx, btn['rect'].centery)
-            
-            if mouse_click and btn['rect'].collidepoint(mouse_pos):
-                handle_difficulty(btn['text'].upper())
-    
-    elif game_over:
-        # Game over screen
-        draw_text("GAME OVER", assets['fonts']['large'], COLORS['RED'], WIDTH//2, 150)
-        draw_text(f"SCORE: {game_data.score}", assets['fonts']['main'], COLORS['WHITE'], WIDTH//2, 220)
-        
-        # Create buttons
-        play_again_btn = create_button("PLAY AGAIN", WIDTH//2-100, 300, 200, 50, COLORS['GREEN'])
-        quit_btn = create_button("QUIT", WIDTH//2-100, 370, 200, 50, COLORS['RED'])
-        
-        # Draw buttons
-        pygame.draw.rect(screen, play_again_btn['color'], play_again_btn['rect'], border_radius=10)
-        draw_text(play_again_btn['text'], assets['fonts']['main'], COLORS['BLACK'], 
-                 play_again_btn['rect'].centerx, play_again_btn['rect'].centery)
-        
-        pygame.draw.rect(screen, quit_btn['color'], quit_btn['rect'], border_radius=10)
-        draw_text(quit_btn['text'], assets['fonts']['main'], COLORS['BLACK'], 
-                 quit_btn['rect'].centerx, quit_btn['rect'].centery)
-        
-        # Handle button clicks
-        if mouse_click:
-            if play_again_btn['rect'].collidepoint(mouse_pos):
-                game_data.reset()
-                road_y = 0
-                game_over = False
-                game_active = True
-            elif quit_btn['rect'].collidepoint(mouse_pos):
+        dirty.full()  # The next world frame paints over all of it
+        profiler.mark('flip')
+        if capture:
+            capture.capture(screen)
+            profiler.mark('capture')
+        scheduler.drawn()
+
+    while running:
+        # Gameplay and the menus over the scrolling road need every frame, until nobody
+        # has touched the menus for a while; the other screens only change on input
+        static = paused or show_welcome or entering_name or player_select is not None or show_leaderboard
+        scrolling = not static and (game_active or not scheduler.idle)
+        profiler.next_frame()
+        scheduler.wait(scrolling)
+        profiler.mark('idle')  # The frame cap, or the whole sleep on a static screen
+        events = scheduler.events()
+        now = time.perf_counter()
+        frame_time = now - last_time if scrolling else 0  # Time asleep is not simulated
+        last_time = now
+        mouse_pos = pygame.mouse.get_pos()
+        mouse_click = False
+
+        for event in events:
+            if event.type == pygame.QUIT:
                 running = False
-
-        save_player_score(player['uid'], game_data.score)
-    
-    elif game_active:
-        # Gameplay controls
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:
-            game_data.player_rect.x = max(ROAD_X, game_data.player_rect.x - game_data.player_speed)
-        if keys[pygame.K_RIGHT]:
-            game_data.player_rect.x = min(ROAD_X + ROAD_WIDTH - CAR_WIDTH, 
-                                        game_data.player_rect.x + game_data.player_speed)
-
-        # Update enemies with different speeds for each lane
-        for i, (enemy_rect, sprite, speed) in enumerate(game_data.enemy_cars):
-            enemy_rect.y += speed  # Move downward at assigned speed
-            
-            # Reset if gone past bottom of screen
-            if enemy_rect.top > HEIGHT:
-                enemy_rect.y = random.randint(-300, -50)
-                # Keep same lane by checking x position
-                if enemy_rect.x < ROAD_X + (ROAD_WIDTH // 2):
-                    # Left lane - faster
-                    enemy_rect.x = random.randint(ROAD_X, ROAD_X + (ROAD_WIDTH // 2) - 10)
-                    speed = game_data.enemy_speed_left
-                    sprite = assets['enemy_cars']['down_left']  # Maintain correct sprite
-                else:
-                    # Right lane - slower
-                    enemy_rect.x = random.randint(ROAD_X + (ROAD_WIDTH // 2) + 10, ROAD_X + ROAD_WIDTH - CAR_WIDTH)
-                    speed = game_data.enemy_speed_right
-                    sprite = assets['enemy_cars']['down_right']  # Maintain correct sprite
-                game_data.enemy_cars[i] = (enemy_rect, sprite, speed)
-                game_data.score += 1
-
-            # Check collision
-            if simple_collision(game_data.player_rect, enemy_rect):
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_click = True
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_p and game_active:
+                    paused = not paused
+                    if paused:
+                        pause_frame = screen.copy()
+                        scheduler.invalidate()
+                elif paused and event.key == pygame.K_s:
+                    paused = False  # "Skip" resumes the game
+                if event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+                    dirty.full()
+                if event.key == pygame.K_F4:
+                    scaled = not scaled
+                    dirty.full()
+                if event.key == pygame.K_F9 and capture:
+                    capture.toggle()
+        profiler.mark('events')
+
+        # --- PAUSE CHECK: Do this BEFORE any game logic or drawing ---
+        if paused:
+            if scheduler.redraw:
+                draw_pause(screen, pause_frame)
+                present_static()
+            continue  # Skip the rest of the loop, so nothing moves/updates
+
+        # --- Static screens: handle their input, redraw only if it changed anything ---
+        if show_welcome:
+            if any(event.type in (WELCOME_DONE, pygame.KEYDOWN) for event in events):
+                pygame.time.set_timer(WELCOME_DONE, 0)
+                show_welcome = False
+                difficulty_selection = True
+            elif scheduler.redraw:
+                screen.blit(welcome_layer.get(screen.get_size(), player['username'],
+                                              assets['fonts']['large'], assets['fonts']['main']), (0, 0))
+                present_static()
+            continue  # Skip rest of loop until welcome is done
+
+        if entering_name:
+            for event in events:
+                if event.type != pygame.KEYDOWN:
+                    continue
+                if event.key == pygame.K_RETURN and username.strip():
+                    entering_name = False
+                    start_welcome(player_repo.new_player(username.strip()))
+                    break
+                new_name = edit_search(username, event)
+                if new_name is not None:
+                    username = new_name
+            if entering_name and scheduler.redraw:
+                draw_name_entry(screen, assets['fonts']['main'], username)
+                present_static()
+            continue
+
+        if player_select is not None:
+            for event in events:
+                if event.type == SCORES_UPDATED:
+                    player_select.refresh(player_repo.count(player_query))
+                if event.type == pygame.MOUSEWHEEL:
+                    player_select.move(-event.y)
+                if event.type != pygame.KEYDOWN:
+                    continue
+                if event.key == pygame.K_RETURN:
+                    selected = player_select.selected_item()
+                    if selected is not None:
+                        player_select = None
+                        start_welcome(selected)
+                        break
+                elif event.key == pygame.K_ESCAPE:
+                    player_select = None
+                    break
+                elif not player_select.handle_key(event.key):
+                    new_query = edit_search(player_query, event)
+                    if new_query is not None and new_query != player_query:
+                        player_query = new_query
+                        player_select = player_list_view(player_query)
+            if player_select is not None and scheduler.redraw:
+                draw_player_select(screen, assets['fonts']['main'], player_select, player_query)
+                present_static()
+            continue
+
+        if show_leaderboard:
+            for event in events:
+                if event.type == SCORES_UPDATED:
+                    leaderboard.refresh(player_repo.count(leaderboard_query))
+                if event.type == pygame.MOUSEWHEEL:
+                    leaderboard.move(-event.y)
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        show_leaderboard = False
+                    elif not leaderboard.handle_key(event.key):
+                        new_query = edit_search(leaderboard_query, event)
+                        if new_query is not None and new_query != leaderboard_query:
+                            leaderboard_query = new_query
+                            leaderboard = leaderboard_view(leaderboard_query)
+            if show_leaderboard and scheduler.redraw:
+                draw_leaderboard(screen, assets['fonts']['main'], leaderboard, leaderboard_query)
+                present_static()
+            continue  # Skip rest of loop until leaderboard is done
+
+        if not scrolling and not scheduler.redraw:
+            continue  # Menu gone idle, it still shows what was last drawn
+        scheduler.drawn()  # This frame draws it, a click below opening a static screen asks again
+
+        # --- All your game logic and drawing below here ---
+        # Advance the world in fixed steps, then draw it blended between the last two steps
+        accumulator += min(frame_time, MAX_FRAME_TIME)
+        left = right = False
+        if game_active:
+            # Gameplay controls
+            keys = pygame.key.get_pressed()
+            left, right = keys[pygame.K_LEFT], keys[pygame.K_RIGHT]
+        profiler.mark('events')
+        steps = 0
+        while accumulator >= SIM_DT:
+            if steps == MAX_STEPS_PER_FRAME:
+                # Too far behind to catch up, drop the backlog rather than spiral
+                accumulator = 0
+                break
+            previous = capture_positions()
+            accumulator -= SIM_DT
+            steps += 1
+
+            if advance_world(profiler, game_active, left, right):
+                save_recording(recorder)
+                player_repo.save_score(player['uid'], game_data.score)
                 # Visual feedback for collision
                 screen.fill(COLORS['RED'])
                 pygame.display.flip()
                 pygame.time.delay(200)
+                profiler.mark('flip')
                 game_active = False
                 game_over = True
-
-        # Improved infinite level progression
-        if game_data.score > 0 and game_data.score % 20 == 0 and not game_data.just_leveled_up:
-            game_data.just_leveled_up = True
-            game_data.current_level += 1
-            game_data.setup_level()
-        else:
-            if game_data.score % 10 != 0:
-                game_data.just_leveled_up = False
-
-        # Draw vehicles
-        screen.blit(assets['player_car'], game_data.player_rect)
-        for enemy_rect, sprite, _ in game_data.enemy_cars:
-            screen.blit(sprite, enemy_rect)
-
-        # Display score and level
-        score_text = assets['fonts']['score'].render(f"SCORE: {game_data.score}", True, COLORS['WHITE'])
-        screen.blit(score_text, (20, 20))
-        
-        level_text = assets['fonts']['score'].render(f"LEVEL: {game_data.current_level + 1}", True, COLORS['WHITE'])
-        screen.blit(level_text, (20, 60))
-
-        # Only show manual panel if level is less than 2 (current_level < 1 means level 1)
-        if game_data.current_level < 1:
-            draw_manual_panel(screen, assets['fonts']['main'])
-
-        rank = get_player_rank(player['uid'])
-        draw_top_right_info(screen, assets['fonts']['main'], player['username'], game_data.score, player['score'], rank)
-
-    if show_welcome:
-        screen.fill((30, 30, 30))
-        banner = assets['fonts']['large'].render(f"Welcome, {player['username']}!", True, COLORS['YELLOW'])
-        screen.blit(banner, (WIDTH//2 - banner.get_width()//2, HEIGHT//2 - 60))
-        info = assets['fonts']['main'].render("Press any key to continue...", True, COLORS['WHITE'])
-        screen.blit(info, (WIDTH//2 - info.get_width()//2, HEIGHT//2 + 10))
-        pygame.display.flip()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN or (pygame.time.get_ticks() - welcome_timer > 1500):
-                show_welcome = False
-                difficulty_selection = True
-        continue  # Skip rest of loop until welcome is done
-
-    if paused:
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        screen.blit(overlay, (0, 0))
-        pause_text = assets['fonts']['large'].render("PAUSED", True, COLORS['YELLOW'])
-        screen.blit(pause_text, (WIDTH//2 - pause_text.get_width()//2, HEIGHT//2 - 40))
-        skip_text = assets['fonts']['main'].render("Press S to skip", True, COLORS['WHITE'])
-        screen.blit(skip_text, (WIDTH//2 - skip_text.get_width()//2, HEIGHT//2 + 30))
-        pygame.display.flip()
-        clock.tick(10)
-        continue  # Skip rest of game loop while paused
-    
-    if show_leaderboard:
-        draw_leaderboard(screen, assets['fonts']['main'])
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                show_leaderboard = False
-        continue  # Skip rest of loop until leaderboard is done
+                scheduler.wake()  # The game over screen idles from now, however long keys were held
+                previous = capture_positions()
+                accumulator = 0
+        alpha = accumulator / SIM_DT
+
+        # The scene goes to the low resolution framebuffer when scaled, the rest straight to the screen
+        scene = low_res if scaled else screen
+        bg_index = draw_world(scene, previous, alpha, dirty, profiler)
+        if game_active:
+            draw_cars(scene, previous, alpha, dirty, profiler)
+        if scaled:
+            low_res.upscale(screen)
+            profiler.mark('upscale')
+
+        # Anything but a steady gameplay or menu frame repaints the whole display
+        view = (game_active, difficulty_selection, game_over, bg_index)
+        if view != last_view:
+            dirty.full()
+            last_view = view
+
+        # Game states
+        # Main menu state
+        if not game_active and not difficulty_selection and not game_over:
+            screen.blits(menu_layer.get(assets['fonts']['large'], assets['fonts']['main']))
+
+            if mouse_click:
+                if new_btn['rect'].collidepoint(mouse_pos):
+                    entering_name, username = True, ""
+                    scheduler.invalidate()
+                elif load_btn['rect'].collidepoint(mouse_pos):
+                    if player_repo.count():
+                        player_query = ""
+                        player_select = player_list_view()
+                        scheduler.invalidate()
+                elif leaderboard_btn['rect'].collidepoint(mouse_pos):
+                    show_leaderboard = True
+                    leaderboard_query = ""
+                    leaderboard = leaderboard_view()
+                    scheduler.invalidate()
+
+        elif difficulty_selection:
+            # Difficulty selection
+            screen.blits(difficulty_layer.get(assets['fonts']['large'], assets['fonts']['main']))
+
+            for btn in DIFFICULTY_BUTTONS:
+                if mouse_click and btn['rect'].collidepoint(mouse_pos):
+                    handle_difficulty(btn['text'].upper())
+
+        elif game_over:
+            # Game over screen
+            screen.blits(game_over_layer.get(assets['fonts']['large'], assets['fonts']['main'], game_data.score))
+
+            # Handle button clicks
+            if mouse_click:
+                if play_again_btn['rect'].collidepoint(mouse_pos):
+                    game_data.reset()
+                    recorder = Recorder(game_data)
+                    road_y = 0
+                    game_over = False
+                    game_active = True
+                elif quit_btn['rect'].collidepoint(mouse_pos):
+                    running = False
     
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
+        elif game_active:
+            draw_hud(screen, dirty, profiler)
+        profiler.mark('menus')  # Whichever menu screen drew instead, nothing during gameplay
+
+        if profiler.overlay:
+            dirty.add(draw_profiler_overlay(screen, assets['fonts']['tiny'], profiler) or (0, 0, 0, 0))
+            profiler.mark('overlay')
+
+        dirty.present()
+        profiler.mark('flip')
+        if capture:
+            capture.capture(screen)
+            profiler.mark('capture')
+        if first_frame:
+            first_frame = False
+            phase("first frame")
+            print(f"First frame after {(time.perf_counter() - STARTED) * 1000:.0f} ms: "
+                  + ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings)
+                  + f" ({asset_cache.hits} images cached, {asset_cache.misses} built)")
+
+    profiler.close()
+    if capture:
+        capture.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Build-once cache of converted and scaled images for fast startup
+
+The first launch decodes each PNG, converts it to the display format and
+scales it, then writes the finished pixels raw to CACHE_DIR. Later
+launches memory-map those files and wrap them as surfaces directly (or
+read them straight into one), with no decoding or scaling. An entry is
+rebuilt whenever the source file's mtime, the target size or the display
+pixel format changes.
+"""
+import os
+import mmap
+import struct
+import hashlib
+import pygame
+
+CACHE_DIR = ".asset_cache"
+MAGIC = b'RCAC'
+VERSION = 1
+# magic, version, alpha, width, height, r/g/b/a masks
+HEADER = struct.Struct('<4sBBHH4I')
+# Masks pygame.image.frombuffer gives a 'BGRA' buffer, the usual display format
+BGRA_MASKS = (0xFF0000, 0xFF00, 0xFF, 0xFF000000)
+
+
+def digest(key):
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:8]
+
+
+class AssetCache:
+    """Loads images through the on-disk cache, building missing entries"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def image(self, path, size=None, alpha=True, scale=1):
+        """Surface for path converted for the display, scaled to size or by scale"""
+        mtime = os.stat(path).st_mtime_ns
+        masks = pygame.display.get_surface().get_masks()
+        # Files are named {image}-{variant}-{version}: each size of an image is its own
+        # variant, a new version of one replaces only that variant's older files
+        variant = f"{os.path.splitext(os.path.basename(path))[0]}-{digest((os.path.abspath(path), size, scale, alpha))}-"
+        entry = os.path.join(self.cache_dir, f"{variant}{digest((mtime, masks, VERSION))}.raw")
+
+        surf = self._read(entry, alpha)
+        if surf is not None:
+            self.hits += 1
+            return surf
+        self.misses += 1
+
+        surf = pygame.image.load(path)
+        surf = surf.convert_alpha() if alpha else surf.convert()
+        if size is None and scale != 1:
+            size = (surf.get_width() * scale, surf.get_height() * scale)
+        if size is not None:
+            surf = pygame.transform.scale(surf, size)
+        try:
+            self._write(entry, variant, surf, alpha)
+        except OSError as e:
+            print(f"Asset cache write error: {e}")
+        return surf
+
+    def _read(self, entry, alpha):
+        try:
+            with open(entry, "rb") as f:
+                magic, version, has_alpha, w, h, *masks = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC or version != VERSION or bool(has_alpha) != alpha \
+                        or os.fstat(f.fileno()).st_size != HEADER.size + w * h * 4:
+                    return None
+                if alpha and tuple(masks) == BGRA_MASKS:
+                    # Same layout convert_alpha() produces, so the surface just wraps the
+                    # mapping; copy-on-write keeps the file intact if anything draws on it
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                    return pygame.image.frombuffer(memoryview(mapped)[HEADER.size:], (w, h), 'BGRA')
+                # Opaque (or unusual) formats are read straight into a surface of their
+                # own format, wrapping them would turn backgrounds into slow alpha blits
+                surf = pygame.Surface((w, h), pygame.SRCALPHA if alpha else 0, 32, masks)
+                f.readinto(surf.get_view('0'))
+                return surf
+        except (OSError, ValueError, struct.error, pygame.error):
+            return None
+
+    def _write(self, entry, variant, surf, alpha):
+        w, h = surf.get_size()
+        if surf.get_bytesize() != 4 or surf.get_pitch() != w * 4:
+            return  # Only tightly packed 32-bit pixels round-trip through the raw format
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Drop older versions of the same image at the same size
+        for old in os.listdir(self.cache_dir):
+            if old.startswith(variant) and old.endswith(".raw"):
+                os.remove(os.path.join(self.cache_dir, old))
+        tmp_path = f"{entry}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, alpha, w, h, *surf.get_masks()))
+            f.write(surf.get_buffer().raw)
+        os.replace(tmp_path, entry)
@@ -0,0 +1,323 @@
+"""Scripted benchmark: drive the game's screens headlessly and check them against a baseline
+
+Each scenario sets the game up in one state and renders frames as fast as
+it can, using the same drawing code as the real main loop. Frames/sec and
+frame-time percentiles are compared with the stored baseline, and the run
+fails if any scenario got slower than the threshold allows.
+
+    python bench.py --save-baseline     # record this machine's numbers
+    python bench.py                     # run everything, exit 1 on a regression, 2 without a baseline
+    python bench.py --scenario level1 --scenario menu --frames 1000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # No window unless asked for
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import RetroCarGame as game
+from biomes import BiomeStore
+from players import PlayerRepository, SQLitePlayerRepository, generate_uid, import_json
+from profiler import FrameProfiler, percentile
+from render import DigitAtlas, DirtyRects, LowRes
+from replay import Recorder
+from simulation import LANES, GameData, dodge_policy
+
+BASELINE_FILE = "bench_baseline.json"
+SEED = 1234
+
+
+def synthetic_players(path, count, seed=SEED):
+    """Write a players.json with count players and random scores"""
+    rng = random.Random(seed)
+    players = {}
+    for i in range(count):
+        uid = generate_uid()
+        players[uid] = {"uid": uid, "username": f"racer{i:06d}", "score": rng.randint(0, 500)}
+    with open(path, "w") as f:
+        json.dump(players, f)
+
+
+class Bench:
+    """Game globals set up once, plus a synthetic player file per size"""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.repos = {}
+        game.screen = game.init_display()
+        cache = game.AssetCache()
+        game.assets = game.load_assets(cache)
+        # Every biome resident, so level scenarios never wait on the loader
+        game.biomes = BiomeStore(lambda index: game.load_biome(cache, index), budget=0, keep=len(game.BIOMES))
+        for index in range(len(game.BIOMES)):
+            game.biomes.require(index)
+        game.enemy_sprites = [game.assets['enemy_cars'][lane] for lane in LANES]
+        game.score_digits = DigitAtlas(game.assets['fonts']['score'], game.COLORS['WHITE'])
+        game.game_data = GameData(seed=SEED)
+        game.recorder = Recorder(game.game_data)
+        self.profiler = FrameProfiler(game.PROFILE_PHASES)  # Stays disabled, marks cost nothing
+        self.dirty = DirtyRects(False)
+        self.low_res = LowRes(game.screen.get_size())
+        self.scaled = False
+
+    def use_players(self, count, sqlite=False):
+        """Point the game at a synthetic player file of count players, or a database made from it"""
+        if (count, sqlite) not in self.repos:
+            path = os.path.join(self.workdir, f"players-{count}.json")
+            if not os.path.exists(path):
+                synthetic_players(path, count)
+            if sqlite:
+                db_path = os.path.join(self.workdir, f"players-{count}.db")
+                import_json(path, db_path)
+                self.repos[count, sqlite] = SQLitePlayerRepository(db_path)
+            else:
+                self.repos[count, sqlite] = PlayerRepository(path)
+        game.player_repo = self.repos[count, sqlite]
+        game.player = game.player_repo.first()
+
+    def start_game(self, level=0):
+        game.game_data.reset(SEED)
+        game.recorder = Recorder(game.game_data)
+        if level:
+            game.game_data.current_level = level
+            game.game_data.setup_level()
+
+    def world_frame(self, playing=False):
+        """One step and draw of the scrolling world and, while playing, the cars, as the main loop does
+
+        Returns True if the player crashed.
+        """
+        previous = game.capture_positions()
+        left, right = dodge_policy(game.game_data) if playing else (False, False)
+        crashed = game.advance_world(self.profiler, playing, left, right)
+        scene = self.low_res if self.scaled else game.screen
+        game.draw_world(scene, previous, 0.5, self.dirty, self.profiler)
+        if playing:
+            game.draw_cars(scene, previous, 0.5, self.dirty, self.profiler)
+        if self.scaled:
+            self.low_res.upscale(game.screen)
+        return crashed
+
+    def close(self):
+        for repo in self.repos.values():
+            repo.close()
+
+
+# --- Scenarios: setup(bench) returns the per-frame function ---
+
+def menu(scaled=False):
+    def setup(bench):
+        bench.use_players(10_000)
+        bench.scaled = scaled
+        fonts = game.assets['fonts']
+
+        def frame():
+            bench.world_frame()
+            game.screen.blits(game.menu_layer.get(fonts['large'], fonts['main']))
+            pygame.display.flip()
+        return frame
+    return setup
+
+
+def gameplay(level, sqlite=False, scaled=False):
+    def setup(bench):
+        bench.use_players(10_000, sqlite)
+        bench.scaled = scaled
+        bench.start_game(level)
+
+        def frame():
+            # A crash or a level up starts the level over, so every frame measures the same level
+            if bench.world_frame(playing=True) or game.game_data.current_level != level:
+                bench.start_game(level)
+            game.draw_hud(game.screen, bench.dirty, bench.profiler)
+            pygame.display.flip()
+        return frame
+    return setup
+
+
+def game_over(bench):
+    bench.use_players(10_000)
+    bench.start_game()
+    fonts = game.assets['fonts']
+
+    def frame():
+        bench.world_frame()
+        game.screen.blits(game.game_over_layer.get(fonts['large'], fonts['main'], game.game_data.score))
+        pygame.display.flip()
+    return frame
+
+
+def leaderboard(players, sqlite=False):
+    def setup(bench):
+        bench.use_players(players, sqlite)
+        view = game.leaderboard_view()
+
+        def frame():
+            game.draw_leaderboard(game.screen, game.assets['fonts']['main'], view, "")
+            pygame.display.flip()
+            view.move(1, wrap=True)  # Scroll like holding DOWN
+        return frame
+    return setup
+
+
+def player_select(players):
+    def setup(bench):
+        bench.use_players(players)
+        view = game.player_list_view()
+
+        def frame():
+            game.draw_player_select(game.screen, game.assets['fonts']['main'], view, "")
+            pygame.display.flip()
+            view.move(1, wrap=True)  # Scroll like holding DOWN
+        return frame
+    return setup
+
+
+def player_search(players):
+    def setup(bench):
+        bench.use_players(players)
+        # Type a name a letter at a time, then delete it again
+        name = game.player_repo.first()['username']
+        queries = [name[:i] for i in range(len(name) + 1)]
+        queries += queries[-2:0:-1]
+        step = [0]
+
+        def frame():
+            query = queries[step[0] % len(queries)]
+            view = game.player_list_view(query)
+            game.draw_player_select(game.screen, game.assets['fonts']['main'], view, query)
+            pygame.display.flip()
+            step[0] += 1
+        return frame
+    return setup
+
+
+SCENARIOS = {
+    'menu': menu(),
+    'level1': gameplay(0),
+    'level10': gameplay(10),
+    'menu_low_res': menu(scaled=True),
+    'level1_low_res': gameplay(0, scaled=True),
+    'level10_low_res': gameplay(10, scaled=True),
+    'game_over': game_over,
+    'leaderboard_10k': leaderboard(10_000),
+    'leaderboard_100k': leaderboard(100_000),
+    'level1_sqlite': gameplay(0, sqlite=True),
+    'leaderboard_sqlite_100k': leaderboard(100_000, sqlite=True),
+    'player_select_10k': player_select(10_000),
+    'player_select_100k': player_select(100_000),
+    'player_search_100k': player_search(100_000),
+}
+
+
+def run_scenario(bench, name, frames, max_seconds):
+    bench.scaled = False  # Full resolution unless the scenario says otherwise
+    frame = SCENARIOS[name](bench)
+    # Warm up caches for a few frames, the slow screens get just one
+    started = time.perf_counter()
+    for _ in range(min(30, max(1, frames // 10))):
+        pygame.event.pump()
+        frame()
+        if time.perf_counter() - started > max_seconds / 10:
+            break
+    elapsed = time.perf_counter() - started
+    if elapsed > max_seconds:
+        times = [elapsed * 1000]  # One frame blew the whole budget, that is the measurement
+    else:
+        times = []
+        started = time.perf_counter()
+        while len(times) < frames and time.perf_counter() - started < max_seconds:
+            pygame.event.pump()
+            t = time.perf_counter()
+            frame()
+            times.append((time.perf_counter() - t) * 1000)
+        elapsed = time.perf_counter() - started
+    times.sort()
+    return {
+        'frames': len(times),
+        'fps': round(len(times) / elapsed, 2),
+        'p50_ms': round(percentile(times, 50), 3),
+        'p95_ms': round(percentile(times, 95), 3),
+        'p99_ms': round(percentile(times, 99), 3)
+    }
+
+
+def regressions(results, baseline, threshold):
+    """Scenarios slower than baseline by more than threshold (a fraction), as messages"""
+    found = []
+    for name, result in results.items():
+        base = baseline[name]
+        if result['fps'] < base['fps'] * (1 - threshold):
+            found.append(f"{name}: {result['fps']} fps, baseline {base['fps']}")
+        if result['p99_ms'] > base['p99_ms'] * (1 + threshold):
+            found.append(f"{name}: p99 {result['p99_ms']} ms, baseline {base['p99_ms']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game's screens headlessly")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="run only these (repeatable), defaults to all")
+    parser.add_argument('--frames', type=int, default=600, help="measured frames per scenario")
+    parser.add_argument('--max-seconds', type=float, default=10, help="time cap per scenario")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown before failing, 0.25 = 25%%")
+    parser.add_argument('--out', help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    names = args.scenario or list(SCENARIOS)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        bench = Bench(workdir)
+        try:
+            for name in names:
+                results[name] = r = run_scenario(bench, name, args.frames, args.max_seconds)
+                print(f"{name:20} {r['fps']:9.1f} fps  p50 {r['p50_ms']:8.3f} ms  "
+                      f"p95 {r['p95_ms']:8.3f} ms  p99 {r['p99_ms']:8.3f} ms  ({r['frames']} frames)")
+        finally:
+            bench.close()
+    pygame.quit()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"No baseline to compare with ({e}), run with --save-baseline first")
+        return 2
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"No baseline for {', '.join(missing)} in {args.baseline}, run with --save-baseline first")
+        return 2
+    found = regressions(results, baseline, args.threshold)
+    for message in found:
+        print(f"REGRESSION {message}")
+    if not found:
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
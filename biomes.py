@@ -0,0 +1,92 @@
+"""Biome scenery loaded on demand, with background prefetch and an LRU memory budget
+
+The game asks for the biome of each level as it draws. Biomes that are
+not resident yet are loaded by a background thread while the one already
+on screen keeps showing; the game also prefetches the next level's biome
+before the player gets there. Once the resident biomes add up to more
+than the budget, the least recently drawn ones are dropped, so memory
+stays bounded however many biomes ship.
+"""
+import queue
+import threading
+from collections import OrderedDict
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class BiomeStore:
+    """Surfaces by biome index, built by load(index) and kept within budget bytes
+
+    get() never blocks: a biome that is not resident returns None and is
+    queued for the loader thread. prefetch() queues one ahead of time and
+    require() loads one on the calling thread. Eviction skips the keep most
+    recently used biomes, which covers a cross-fade (two on screen) plus
+    a prefetched one, so a budget below that holds keep biomes at most.
+    """
+
+    def __init__(self, load, budget, keep=3):
+        self.load = load
+        self.budget = budget
+        self.keep = keep
+        self.bytes = 0
+        self.loads = 0
+        self.evictions = 0
+        self._resident = OrderedDict()  # index -> surface, least recently used first
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._work, name="biome-loader", daemon=True)
+        self._thread.start()
+
+    def get(self, index):
+        """The biome if resident, otherwise None and it starts loading"""
+        with self._lock:
+            surface = self._resident.get(index)
+            if surface is not None:
+                self._resident.move_to_end(index)
+                return surface
+        self.prefetch(index)
+        return None
+
+    def prefetch(self, index):
+        """Load index in the background unless it is resident or already on its way"""
+        with self._lock:
+            if index in self._resident or index in self._pending:
+                return
+            self._pending.add(index)
+        self._queue.put(index)
+
+    def require(self, index):
+        """The biome, loaded on this thread if need be"""
+        with self._lock:
+            surface = self._resident.get(index)
+            if surface is not None:
+                self._resident.move_to_end(index)
+                return surface
+        return self._add(index, self.load(index))
+
+    def _work(self):
+        while True:
+            index = self._queue.get()
+            try:
+                self._add(index, self.load(index))
+            except Exception as e:
+                print(f"Biome {index} load error: {e}")
+                with self._lock:
+                    self._pending.discard(index)
+
+    def _add(self, index, surface):
+        with self._lock:
+            self._pending.discard(index)
+            if index in self._resident:
+                return self._resident[index]  # Loaded twice, keep the first
+            self._resident[index] = surface
+            self.bytes += surface_bytes(surface)
+            self.loads += 1
+            while self.bytes > self.budget and len(self._resident) > self.keep:
+                _, old = self._resident.popitem(last=False)
+                self.bytes -= surface_bytes(old)
+                self.evictions += 1
+            return surface
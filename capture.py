@@ -0,0 +1,143 @@
+"""Gameplay capture to a PNG sequence or a raw video file, written off the main loop
+
+The loop hands each presented screen to FrameCapture.capture(), which
+copies the pixels through the surface's buffer into a bounded queue and
+returns. Worker threads turn the copies into files: a directory of
+frame_NNNNNN.png (numbered by loop frame, so gaps show drops) or one
+.raw file of rgb24 frames with a .json description next to it, e.g.
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 720x600 -r 60 -i capture.raw capture.mp4
+
+When the workers fall behind the queue fills up and frames are dropped,
+never waited for; the count is reported at the end.
+"""
+import os
+import json
+import zlib
+import queue
+import struct
+import threading
+import numpy as np
+
+PNG_LEVEL = 1  # zlib level, fast beats small when keeping up with the game
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(rgb):
+    """PNG bytes for an (h, w, 3) uint8 array, compressed by zlib outside the GIL"""
+    h, w, _ = rgb.shape
+    rows = np.zeros((h, 1 + w * 3), dtype=np.uint8)  # Filter byte 0 (none) per row
+    rows[:, 1:] = rgb.reshape(h, w * 3)
+    return b''.join([
+        PNG_SIGNATURE,
+        png_chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)),
+        png_chunk(b'IDAT', zlib.compress(rows.tobytes(), PNG_LEVEL)),
+        png_chunk(b'IEND', b'')
+    ])
+
+
+class FrameCapture:
+    """Snapshots every stride-th frame and writes them from background threads
+
+    path ending in .raw writes one rgb24 file (in frame order, by a single
+    worker); any other path is a directory for a PNG sequence.
+    """
+
+    def __init__(self, path, stride=1, queue_size=32, workers=2, fps=60):
+        self.path = path
+        self.stride = max(1, stride)
+        self.fps = fps
+        self.raw = path.endswith(".raw")
+        self.enabled = True
+        self.frames = 0  # Frames offered to capture()
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._size = None
+        self._layout = None  # (pitch, bytes per pixel, byte offsets of R, G, B)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._raw_file = None
+        self._raw_frames = []
+        if self.raw:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._raw_file = open(path, "wb")
+            workers = 1  # Frames must land in order
+        else:
+            os.makedirs(path, exist_ok=True)
+        self._workers = [threading.Thread(target=self._work, name=f"capture-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    def capture(self, surface):
+        """Queue a copy of surface if this frame is due, never blocks"""
+        self.frames += 1
+        if not self.enabled or self.frames % self.stride:
+            return
+        if self._queue.full():
+            self.dropped += 1  # Skip the copy too
+            return
+        if self._layout is None:
+            self._size = surface.get_size()
+            # Byte of each channel within a little-endian pixel
+            r, g, b, _ = surface.get_shifts()
+            self._layout = (surface.get_pitch(), surface.get_bytesize(), [r // 8, g // 8, b // 8])
+        try:
+            self._queue.put_nowait((self.frames, surface.get_buffer().raw))
+        except queue.Full:
+            self.dropped += 1
+
+    def _rgb(self, pixels):
+        w, h = self._size
+        pitch, bytesize, channels = self._layout
+        rows = np.frombuffer(pixels, dtype=np.uint8).reshape(h, pitch)
+        return rows[:, :w * bytesize].reshape(h, w, bytesize)[:, :, channels]
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            frame, pixels = item
+            try:
+                rgb = self._rgb(pixels)
+                if self.raw:
+                    self._raw_file.write(np.ascontiguousarray(rgb).data)
+                    self._raw_frames.append(frame)
+                else:
+                    with open(os.path.join(self.path, f"frame_{frame:06d}.png"), "wb") as f:
+                        f.write(encode_png(rgb))
+                with self._lock:
+                    self.written += 1
+            except OSError as e:
+                with self._lock:
+                    self.errors += 1
+                    if self.errors == 1:
+                        print(f"Capture write error: {e}")
+
+    def close(self):
+        """Write out everything queued, then report"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self._raw_file is not None:
+            self._raw_file.close()
+            if self._size is not None:
+                w, h = self._size
+                try:
+                    with open(f"{self.path}.json", "w") as f:
+                        json.dump({'width': w, 'height': h, 'pix_fmt': 'rgb24', 'fps': self.fps / self.stride,
+                                   'frames': self._raw_frames}, f)
+                except OSError as e:
+                    print(f"Capture write error: {e}")
+        print(f"Capture: {self.written} frames written to {self.path}, {self.dropped} dropped"
+              + (f", {self.errors} failed" if self.errors else ""))
@@ -0,0 +1,674 @@
+import os
+import sys
+import json
+import uuid
+import sqlite3
+import argparse
+import threading
+import time
+from bisect import bisect_left, insort
+
+SAVE_FILE = "players.json"
+DB_FILE = "players.db"
+DB_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+PREFIX_END = '\U0010ffff'  # Sorts after anything that can follow a prefix
+WRITE_ATTEMPTS = 5  # Tries of a batch while another connection holds the database, then it is dropped
+
+
+def generate_uid():
+    return str(uuid.uuid4())
+
+
+def name_key(username):
+    """What name searches compare, the same in both stores: case folded for any script"""
+    return username.casefold()
+
+
+class ScoreIndex:
+    """Players ordered by score, kept in sorted buckets so rank queries take log time"""
+
+    BUCKET_SIZE = 512
+
+    def __init__(self, entries=()):
+        # Keys sort best-first: (-score, seq, uid), seq keeps file order for ties
+        self._keys = {}
+        self._buckets = []
+        self._maxes = []
+        self._tree = None  # Fenwick tree over bucket lengths, rebuilt after splits
+        self._next_seq = 0
+        self.load(entries)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def load(self, entries):
+        """Bulk add (uid, score) pairs in file order"""
+        for uid, score in entries:
+            self._keys[uid] = (-score, self._next_seq, uid)
+            self._next_seq += 1
+        keys = sorted(self._keys.values())
+        size = self.BUCKET_SIZE
+        self._buckets = [keys[i:i + size] for i in range(0, len(keys), size)]
+        self._maxes = [b[-1] for b in self._buckets]
+        self._tree = None
+
+    def set(self, uid, score):
+        old = self._keys.get(uid)
+        if old is not None:
+            if old[0] == -score:
+                return
+            self._remove(old)
+            key = (-score, old[1], uid)
+        else:
+            key = (-score, self._next_seq, uid)
+            self._next_seq += 1
+        self._keys[uid] = key
+        self._insert(key)
+
+    def discard(self, uid):
+        key = self._keys.pop(uid, None)
+        if key is not None:
+            self._remove(key)
+
+    def rank(self, uid):
+        key = self._keys.get(uid)
+        if key is None:
+            return None
+        return self._position(key) + 1
+
+    def top(self, k=10):
+        result = []
+        for bucket in self._buckets:
+            for key in bucket:
+                if len(result) >= k:
+                    return result
+                result.append(key[2])
+        return result
+
+    def around(self, uid, k=2):
+        """(rank, uid) pairs for up to k players either side of uid"""
+        key = self._keys.get(uid)
+        if key is None:
+            return []
+        pos = self._position(key)
+        start = max(0, pos - k)
+        stop = min(len(self._keys), pos + k + 1)
+        return [(start + i + 1, found) for i, found in enumerate(self.slice(start, stop))]
+
+    def slice(self, start, stop):
+        """Uids at ranks start+1..stop"""
+        if start >= stop:
+            return []
+        i, j = self._locate(start)
+        result = []
+        while i < len(self._buckets) and len(result) < stop - start:
+            bucket = self._buckets[i]
+            take = min(len(bucket) - j, stop - start - len(result))
+            result.extend(key[2] for key in bucket[j:j + take])
+            i += 1
+            j = 0
+        return result
+
+    def _insert(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._tree = None
+            return
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+            self._buckets[i].append(key)
+            self._maxes[i] = key
+        else:
+            insort(self._buckets[i], key)
+        bucket = self._buckets[i]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            self._buckets.insert(i + 1, bucket[self.BUCKET_SIZE:])
+            del bucket[self.BUCKET_SIZE:]
+            self._maxes[i] = bucket[-1]
+            self._maxes.insert(i + 1, self._buckets[i + 1][-1])
+            self._tree = None
+        else:
+            self._tree_add(i, 1)
+
+    def _remove(self, key):
+        i = bisect_left(self._maxes, key)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._tree = None
+
+    def _position(self, key):
+        i = bisect_left(self._maxes, key)
+        return self._prefix(i) + bisect_left(self._buckets[i], key)
+
+    # --- Fenwick tree over bucket lengths ---
+
+    def _build_tree(self):
+        tree = [len(b) for b in self._buckets]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i, delta):
+        if self._tree is None:
+            return
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += delta
+            i |= i + 1
+
+    def _prefix(self, i):
+        """Number of keys in buckets before bucket i"""
+        if self._tree is None:
+            self._build_tree()
+        tree = self._tree
+        total = 0
+        i -= 1
+        while i >= 0:
+            total += tree[i]
+            i = (i & (i + 1)) - 1
+        return total
+
+    def _locate(self, pos):
+        """(bucket, offset) of the key at position pos"""
+        if self._tree is None:
+            self._build_tree()
+        tree = self._tree
+        i = -1
+        step = 1 << (len(tree).bit_length())
+        while step:
+            nxt = i + step
+            if nxt < len(tree) and tree[nxt] <= pos:
+                pos -= tree[nxt]
+                i = nxt
+            step >>= 1
+        return i + 1, pos
+
+
+class PrefixIndex:
+    """Usernames in case-insensitive order, so a prefix search is two bisections"""
+
+    def __init__(self, entries=()):
+        # Keys: (name_key, seq, uid), seq keeps file order for equal names
+        self._keys = sorted((name_key(name), seq, uid) for seq, (uid, name) in enumerate(entries))
+        self._next_seq = len(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, uid, username):
+        insort(self._keys, (name_key(username), self._next_seq, uid))
+        self._next_seq += 1
+
+    def range(self, prefix):
+        """(start, stop) positions of the names starting with prefix"""
+        prefix = name_key(prefix)
+        return (bisect_left(self._keys, (prefix,)),
+                bisect_left(self._keys, (prefix + PREFIX_END,)))
+
+    def slice(self, start, stop):
+        return [key[2] for key in self._keys[start:stop]]
+
+
+class PlayerRepository:
+    """Player records held in memory, written back to disk by a background thread"""
+
+    def __init__(self, path=SAVE_FILE, flush_delay=0.5):
+        self.path = path
+        self.flush_delay = flush_delay  # Seconds to gather changes into one write
+        self.players = self._read()
+        self.index = ScoreIndex((uid, p['score']) for uid, p in self.players.items())
+        self._names = None  # PrefixIndex, built on the first search
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._version = 0  # Bumped on every change
+        self._written = 0  # Version of the last finished write
+        self._flush_wanted = False
+        self._closing = False
+        self._writer = threading.Thread(target=self._write_loop, name="players-writer", daemon=True)
+        self._writer.start()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Player file error: {e}, starting with no players")
+            return {}
+
+    # --- Reads, served from memory ---
+
+    def get(self, uid):
+        return self.players.get(uid)
+
+    def first(self):
+        return next(iter(self.players.values()), None)
+
+    def all(self):
+        return list(self.players.values())
+
+    def rank(self, uid):
+        return self.index.rank(uid)
+
+    def top(self, n=10):
+        return [self.players[uid] for uid in self.index.top(n)]
+
+    def around(self, uid, n=2):
+        """(rank, player) pairs for the n players either side of uid"""
+        return [(rank, self.players[pid]) for rank, pid in self.index.around(uid, n)]
+
+    def ranked(self, start, stop):
+        """(rank, player) pairs for ranks start+1..stop"""
+        return [(start + i + 1, self.players[uid]) for i, uid in enumerate(self.index.slice(start, stop))]
+
+    def count(self, prefix=""):
+        """Number of players whose username starts with prefix, ignoring case"""
+        if not prefix:
+            return len(self.players)
+        start, stop = self._name_index().range(prefix)
+        return stop - start
+
+    def find(self, prefix, start, stop):
+        """Players start..stop of those whose username starts with prefix, in name order"""
+        first, last = self._name_index().range(prefix)
+        return [self.players[uid] for uid in self._names.slice(first + start, min(last, first + stop))]
+
+    def find_ranked(self, prefix, start, stop):
+        """find() as (rank, player) pairs"""
+        return [(self.rank(p['uid']), p) for p in self.find(prefix, start, stop)]
+
+    def _name_index(self):
+        if self._names is None:
+            self._names = PrefixIndex((uid, p['username']) for uid, p in self.players.items())
+        return self._names
+
+    # --- Writes, applied in memory and queued for the writer thread ---
+
+    def new_player(self, username="Player One", uid=None):
+        uid = uid or generate_uid()
+        player_data = {"uid": uid, "username": username, "score": 0}
+        with self._lock:
+            self.players[uid] = player_data
+            self._mark_dirty()
+        self.index.set(uid, 0)
+        if self._names is not None:
+            self._names.add(uid, username)
+        return player_data
+
+    def save_score(self, uid, score):
+        player_data = self.players.get(uid)
+        if player_data is None or score <= player_data['score']:
+            return False
+        with self._lock:
+            player_data['score'] = score
+            self._mark_dirty()
+        self.index.set(uid, score)
+        return True
+
+    def _mark_dirty(self):
+        self._version += 1
+        self._wake.notify_all()
+
+    # --- Persistence ---
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while self._written == self._version and not self._closing:
+                    self._wake.wait()
+                if self._written == self._version:
+                    return
+                # Let a burst of changes pile up so they land in one write
+                deadline = time.monotonic() + self.flush_delay
+                while not self._closing and not self._flush_wanted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wake.wait(remaining)
+                version = self._version
+                data = json.dumps(self.players)
+            try:
+                self._write_file(data)
+            except OSError as e:
+                print(f"Player file write error: {e}")
+                if self._closing:
+                    return
+                time.sleep(self.flush_delay)
+                continue
+            with self._lock:
+                self._written = version
+                self._wake.notify_all()
+
+    def _write_file(self, data):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """Block until every change made so far is on disk"""
+        with self._lock:
+            target = self._version
+            self._flush_wanted = True
+            self._wake.notify_all()
+            while self._written < target and self._writer.is_alive():
+                self._wake.wait(0.1)
+            self._flush_wanted = False
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            self._wake.notify_all()
+        self._writer.join()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL UNIQUE,
+    username TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    username_key TEXT NOT NULL DEFAULT ''  -- name_key(username), SQLite's NOCASE only folds ASCII
+);
+"""
+INDEXES = """
+CREATE INDEX IF NOT EXISTS players_by_score ON players (score DESC, id);
+CREATE INDEX IF NOT EXISTS players_by_name ON players (username_key, id);
+"""
+# Best first, ties in order of creation like the JSON store
+RANKED = "SELECT uid, username, score FROM players ORDER BY score DESC, id"
+# Case-insensitive prefix match as a range over the name index, ?1 is name_key(prefix)
+BY_NAME = ("SELECT uid, username, score FROM players "
+           "WHERE username_key >= ?1 AND username_key < ?1 || ?2")
+UPSERT = ("INSERT INTO players (uid, username, score, username_key) VALUES (?1, ?2, ?3, ?4) "
+          "ON CONFLICT (uid) DO UPDATE SET username = excluded.username, "
+          "username_key = excluded.username_key, score = max(score, excluded.score)")
+
+
+def connect(path):
+    """Connection to a player database, in WAL mode so other cabinets can read while one writes"""
+    db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent, commits skip the fsync
+    db.executescript(SCHEMA)
+    add_name_keys(db)
+    db.executescript(INDEXES)
+    return db
+
+
+def add_name_keys(db):
+    """Fill in username_key for a database from before it existed"""
+    db.execute("BEGIN IMMEDIATE")  # Another cabinet may be upgrading the same file
+    try:
+        if 'username_key' not in [row[1] for row in db.execute("PRAGMA table_info(players)")]:
+            db.execute("ALTER TABLE players ADD COLUMN username_key TEXT NOT NULL DEFAULT ''")
+            db.executemany("UPDATE players SET username_key = ? WHERE id = ?", [
+                (name_key(username), row_id) for row_id, username in db.execute("SELECT id, username FROM players")])
+            db.execute("DROP INDEX IF EXISTS players_by_name")  # Was on username COLLATE NOCASE
+        db.execute("COMMIT")
+    except sqlite3.Error:
+        db.execute("ROLLBACK")
+        raise
+
+
+def is_busy(error):
+    """True for the errors SQLite gives while another connection holds a lock"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class SQLitePlayerRepository:
+    """Players in a SQLite database several game processes can share
+
+    Rank and top-N queries run in SQL against the score index. Reads are
+    cached until the database changes, which PRAGMA data_version reports
+    cheaply, so the HUD can ask for the rank every frame. Writes are queued
+    and committed by a background thread, a burst of them in one transaction.
+    """
+
+    def __init__(self, path=DB_FILE, flush_delay=0.5):
+        self.path = path
+        self.flush_delay = flush_delay  # Seconds to gather changes into one transaction
+        self._db = connect(path)  # Reads, from the game's thread
+        self._players = {}  # uid -> the one dict handed out for that player
+        self._cache = {}
+        self._data_version = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._pending = []  # (sql, params) not yet committed
+        self._in_flight = 0  # Changes taken by the writer and not yet committed
+        self._flush_wanted = False
+        self._closing = False
+        self._writer = threading.Thread(target=self._write_loop, name="players-db-writer", daemon=True)
+        self._writer.start()
+
+    def _player(self, uid, username, score):
+        """The dict for uid, refreshed from a row, so the game's copy sees its own updates"""
+        player_data = self._players.get(uid)
+        if player_data is None:
+            player_data = self._players[uid] = {"uid": uid, "username": username, "score": score}
+        else:
+            player_data['username'] = username
+            player_data['score'] = max(player_data['score'], score)
+        return player_data
+
+    def _cached(self, key, query):
+        # data_version moves whenever another connection, the writer thread included, commits
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._cache.clear()
+            self._data_version = version
+        if key not in self._cache:
+            self._cache[key] = query()
+        return self._cache[key]
+
+    # --- Reads, answered by SQL ---
+
+    def get(self, uid):
+        row = self._db.execute("SELECT uid, username, score FROM players WHERE uid = ?", (uid,)).fetchone()
+        return self._player(*row) if row else self._players.get(uid)
+
+    def first(self):
+        row = self._db.execute("SELECT uid, username, score FROM players ORDER BY id LIMIT 1").fetchone()
+        return self._player(*row) if row else next(iter(self._players.values()), None)
+
+    def all(self):
+        return [self._player(*row) for row in self._db.execute(
+            "SELECT uid, username, score FROM players ORDER BY id")]
+
+    def rank(self, uid):
+        return self._cached(('rank', uid), lambda: self._rank(uid))
+
+    def _rank(self, uid):
+        row = self._db.execute("SELECT id, score FROM players WHERE uid = ?", (uid,)).fetchone()
+        if row is None:
+            return None
+        row_id, score = row
+        # Two range counts over the score index
+        return 1 + self._db.execute(
+            "SELECT (SELECT count(*) FROM players WHERE score > ?1)"
+            " + (SELECT count(*) FROM players WHERE score = ?1 AND id < ?2)",
+            (score, row_id)).fetchone()[0]
+
+    def top(self, n=10):
+        rows = self._cached(('top', n), lambda: self._db.execute(f"{RANKED} LIMIT ?", (n,)).fetchall())
+        return [self._player(*row) for row in rows]
+
+    def around(self, uid, n=2):
+        """(rank, player) pairs for the n players either side of uid"""
+        rank = self.rank(uid)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - n)
+        rows = self._db.execute(f"{RANKED} LIMIT ? OFFSET ?", (rank - start + n, start)).fetchall()
+        return [(start + i + 1, self._player(*row)) for i, row in enumerate(rows)]
+
+    def ranked(self, start, stop):
+        """(rank, player) pairs for ranks start+1..stop"""
+        rows = self._cached(('ranked', start, stop), lambda: self._db.execute(
+            f"{RANKED} LIMIT ? OFFSET ?", (stop - start, start)).fetchall())
+        return [(start + i + 1, self._player(*row)) for i, row in enumerate(rows)]
+
+    def count(self, prefix=""):
+        """Number of players whose username starts with prefix, ignoring case"""
+        if not prefix:
+            return self._cached(('count',), lambda: self._db.execute(
+                "SELECT count(*) FROM players").fetchone()[0])
+        return self._cached(('count', prefix), lambda: self._db.execute(
+            f"SELECT count(*) FROM ({BY_NAME})", (name_key(prefix), PREFIX_END)).fetchone()[0])
+
+    def find(self, prefix, start, stop):
+        """Players start..stop of those whose username starts with prefix, in name order"""
+        rows = self._cached(('find', prefix, start, stop), lambda: self._db.execute(
+            f"{BY_NAME} ORDER BY username_key, id LIMIT ?3 OFFSET ?4",
+            (name_key(prefix), PREFIX_END, stop - start, start)).fetchall())
+        return [self._player(*row) for row in rows]
+
+    def find_ranked(self, prefix, start, stop):
+        """find() as (rank, player) pairs"""
+        return [(self.rank(p['uid']), p) for p in self.find(prefix, start, stop)]
+
+    # --- Writes, applied to the game's dicts and queued for the writer thread ---
+
+    def new_player(self, username="Player One", uid=None):
+        uid = uid or generate_uid()
+        player_data = self._players[uid] = {"uid": uid, "username": username, "score": 0}
+        self._queue(UPSERT, (uid, username, 0, name_key(username)))
+        return player_data
+
+    def save_score(self, uid, score):
+        player_data = self._players.get(uid) or self.get(uid)
+        if player_data is None or score <= player_data['score']:
+            return False
+        player_data['score'] = score
+        self._queue("UPDATE players SET score = ?1 WHERE uid = ?2 AND score < ?1", (score, uid))
+        return True
+
+    def _queue(self, sql, params):
+        with self._lock:
+            self._pending.append((sql, params))
+            self._wake.notify_all()
+
+    # --- Persistence ---
+
+    def _write_loop(self):
+        db = connect(self.path)
+        attempts = 0  # Failed tries of the batch at the head of _pending
+        try:
+            while True:
+                with self._lock:
+                    while not self._pending and not self._closing:
+                        self._wake.wait()
+                    if not self._pending:
+                        return
+                    # Let a burst of changes pile up so they land in one transaction
+                    deadline = time.monotonic() + self.flush_delay
+                    while not self._closing and not self._flush_wanted:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._wake.wait(remaining)
+                    batch, self._pending = self._pending, []
+                    self._in_flight = len(batch)
+                try:
+                    with db:
+                        db.execute("BEGIN IMMEDIATE")
+                        for sql, params in batch:
+                            db.execute(sql, params)
+                except sqlite3.Error as e:
+                    attempts += 1
+                    # Only a database held by another connection can succeed on a retry
+                    retry = is_busy(e) and attempts < WRITE_ATTEMPTS
+                    if retry:
+                        print(f"Player database write error: {e}, retrying")
+                    else:
+                        print(f"Player database write error: {e}, dropping {len(batch)} changes")
+                        attempts = 0
+                    with self._lock:
+                        if retry:
+                            self._pending[:0] = batch  # Goes out with the next batch
+                        self._in_flight = 0
+                        self._wake.notify_all()
+                    if retry:
+                        time.sleep(self.flush_delay)
+                    continue
+                attempts = 0
+                with self._lock:
+                    self._in_flight = 0
+                    self._wake.notify_all()
+        finally:
+            db.close()
+
+    def flush(self):
+        """Block until every change made so far is committed"""
+        with self._lock:
+            self._flush_wanted = True
+            self._wake.notify_all()
+            while (self._pending or self._in_flight) and self._writer.is_alive():
+                self._wake.wait(0.1)
+            self._flush_wanted = False
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            self._wake.notify_all()
+        self._writer.join()
+        self._db.close()
+
+
+def open_repository(path=SAVE_FILE):
+    """The store for path: SQLite for .db/.sqlite files, the JSON file otherwise"""
+    if path.endswith(DB_SUFFIXES):
+        return SQLitePlayerRepository(path)
+    return PlayerRepository(path)
+
+
+def import_json(json_path, db_path, batch_size=1000):
+    """Copy a players.json into a player database, returns the number of players imported
+
+    Players already in the database keep the better of the two scores, so
+    running it twice, or over a file several cabinets wrote to, is safe.
+    """
+    with open(json_path, "r") as f:
+        players = json.load(f)
+    rows = [(p['uid'], p['username'], p['score'], name_key(p['username'])) for p in players.values()]
+    db = connect(db_path)
+    try:
+        for i in range(0, len(rows), batch_size):
+            with db:
+                db.executemany(UPSERT, rows[i:i + batch_size])
+    finally:
+        db.close()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a players.json into a SQLite player database")
+    parser.add_argument('json_path', nargs='?', default=SAVE_FILE)
+    parser.add_argument('db_path', nargs='?', default=DB_FILE)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    try:
+        count = import_json(args.json_path, args.db_path)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"Import error: {e}")
+        return 1
+    print(f"Imported {count} players into {args.db_path} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
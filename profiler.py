@@ -0,0 +1,106 @@
+"""Per-phase frame timing for the main loop, with rolling percentiles and a trace file
+
+The loop calls mark(phase) after each phase, which charges the time since
+the previous mark to it, and next_frame() at the top of every iteration,
+which charges whatever is left (mostly the frame cap's sleep) to 'idle'.
+While disabled both return straight away.
+
+A trace path ending in .csv gets one row per frame; any other path gets one
+JSON object per line. Times are in milliseconds.
+"""
+import csv
+import json
+import time
+from collections import deque
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+class FrameProfiler:
+    """Wall time of each loop phase per frame, kept over a rolling window"""
+
+    def __init__(self, phases, window=300, refresh=30, trace_path=None):
+        self.phases = tuple(phases) + ('idle',)
+        self.window = window
+        self.refresh = refresh  # Frames between summary updates
+        self.overlay = False
+        self.frames = 0
+        self.summary = []  # [(phase, p50 ms, p99 ms)], busy time and the whole frame (total) last
+        self._history = {phase: deque(maxlen=window) for phase in self.phases + ('busy', 'total')}
+        self._current = None
+        self._last = None  # Time of the last mark, None until a whole frame is being measured
+        self._trace_file = None
+        self._trace = None
+        if trace_path:
+            self._open_trace(trace_path)
+
+    @property
+    def enabled(self):
+        return self.overlay or self._trace_file is not None
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+
+    def mark(self, phase):
+        if self._last is not None:
+            now = time.perf_counter()
+            self._current[phase] += now - self._last
+            self._last = now
+
+    def next_frame(self):
+        if not self.enabled:
+            self._last = None
+            return
+        now = time.perf_counter()
+        if self._last is not None:
+            self._current['idle'] += now - self._last
+            self._record(self._current)
+        self._current = dict.fromkeys(self.phases, 0.0)
+        self._last = now
+
+    def _record(self, times):
+        self.frames += 1
+        busy = sum(times.values()) - times['idle']
+        row = {phase: seconds * 1000 for phase, seconds in times.items()}
+        row['busy'] = busy * 1000
+        row['total'] = row['busy'] + row['idle']
+        for phase, ms in row.items():
+            self._history[phase].append(ms)
+        if self._trace is not None:
+            self._trace(self.frames, row)
+        if self.frames % self.refresh == 0:
+            self.summary = self.stats()
+
+    def stats(self):
+        """(phase, p50, p99) in ms over the window for every phase"""
+        result = []
+        for phase, values in self._history.items():
+            ordered = sorted(values)
+            result.append((phase, percentile(ordered, 50), percentile(ordered, 99)))
+        return result
+
+    def _open_trace(self, path):
+        try:
+            self._trace_file = open(path, "w", newline="")
+        except OSError as e:
+            print(f"Profiler trace error: {e}")
+            return
+        columns = list(self._history)
+        if path.endswith(".csv"):
+            writer = csv.writer(self._trace_file)
+            writer.writerow(['frame'] + columns)
+            self._trace = lambda frame, row: writer.writerow([frame] + [f"{row[c]:.3f}" for c in columns])
+        else:
+            out = self._trace_file
+            self._trace = lambda frame, row: out.write(json.dumps(
+                dict(frame=frame, **{c: round(row[c], 3) for c in columns})) + "\n")
+
+    def close(self):
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+            self._trace = None
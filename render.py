@@ -0,0 +1,339 @@
+import random
+import weakref
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    """Bounded LRU of rendered text surfaces keyed by font, text, color and antialias"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self._surfaces[key] = surf
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._surfaces)}
+
+
+class DigitAtlas:
+    """Glyphs rendered once per font so a changing number costs a few blits"""
+
+    def __init__(self, font, color, antialias=True, chars="0123456789-"):
+        self.glyphs = {c: font.render(c, antialias, color) for c in chars}
+        self.height = max(g.get_height() for g in self.glyphs.values())
+
+    def width(self, value):
+        return sum(self.glyphs[c].get_width() for c in str(value))
+
+    def draw(self, surface, value, pos):
+        """Blit value with its top-left at pos, returns the covered rect like Surface.blit"""
+        x, y = pos
+        glyphs = self.glyphs
+        for c in str(value):
+            glyph = glyphs[c]
+            surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+        return pygame.Rect(pos, (x - pos[0], self.height))
+
+
+def scenery_strip(background, sprite, zones, density=0.5, gap=8, seed=0):
+    """Copy of background with sprite scattered over the x ranges in zones, built once per biome
+
+    Sprites go on a jittered grid: one cell per sprite plus gap, each filled
+    with probability density at a random spot inside it. They never overlap,
+    spread evenly, and never cross the top or bottom edge, so the strip tiles
+    seamlessly when scrolled like the road. The game's backgrounds are the
+    same all the way down, so scrolling them along shows no seam either.
+    """
+    strip = background.copy()
+    rng = random.Random(seed)
+    sprite_w, sprite_h = sprite.get_size()
+    height = strip.get_height()
+    rows = max(1, height // (sprite_h + gap))
+    cell_h = height / rows
+    for x_min, x_max in zones:
+        cols = max(1, (x_max - x_min) // (sprite_w + gap))
+        cell_w = (x_max - x_min) / cols
+        for row in range(rows):
+            for col in range(cols):
+                if rng.random() >= density:
+                    continue
+                x = x_min + col * cell_w + rng.uniform(0, max(0, cell_w - sprite_w))
+                y = row * cell_h + rng.uniform(0, max(0, cell_h - sprite_h))
+                strip.blit(sprite, (round(x), round(y)))
+    return strip
+
+
+class ListView:
+    """Scrolling list of any length that only fetches and renders the rows in view
+
+    fetch(start, stop) returns the items at those positions and label(item)
+    their text. The visible window is fetched once and kept until the list
+    scrolls or gets a new source; row text goes through a TextCache.
+    """
+
+    def __init__(self, rect, row_height, label):
+        self.rect = pygame.Rect(rect)
+        self.row_height = row_height
+        self.label = label
+        self.page_size = max(1, self.rect.height // row_height)
+        self.set_source(0, lambda start, stop: [])
+
+    def set_source(self, count, fetch):
+        self.count = count
+        self.fetch = fetch
+        self.top = 0
+        self.selected = 0
+        self._window = None  # (top, items)
+
+    def refresh(self, count):
+        """The source has new data: take its count and fetch the window again, keeping the place"""
+        self.count = count
+        self.selected = max(0, min(self.selected, count - 1))
+        self.top = max(0, min(self.top, self.selected))
+        self._window = None
+
+    def move(self, delta, wrap=False):
+        if not self.count:
+            return
+        if wrap:
+            self.selected = (self.selected + delta) % self.count
+        else:
+            self.selected = max(0, min(self.count - 1, self.selected + delta))
+        # Keep the selection in view
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.page_size:
+            self.top = self.selected - self.page_size + 1
+
+    def handle_key(self, key):
+        """Arrow, page and home/end navigation, returns False for any other key"""
+        if key == pygame.K_UP:
+            self.move(-1, wrap=True)
+        elif key == pygame.K_DOWN:
+            self.move(1, wrap=True)
+        elif key == pygame.K_PAGEUP:
+            self.move(-self.page_size)
+        elif key == pygame.K_PAGEDOWN:
+            self.move(self.page_size)
+        elif key == pygame.K_HOME:
+            self.move(-self.count)
+        elif key == pygame.K_END:
+            self.move(self.count)
+        else:
+            return False
+        return True
+
+    def visible(self):
+        """Items in view, fetched again only after a scroll"""
+        if self._window is None or self._window[0] != self.top:
+            self._window = (self.top, self.fetch(self.top, min(self.count, self.top + self.page_size)))
+        return self._window[1]
+
+    def selected_item(self):
+        items = self.visible()
+        index = self.selected - self.top
+        return items[index] if 0 <= index < len(items) else None
+
+    def draw(self, surface, font, text_cache, color, selected_color):
+        """Blit the visible rows centred in rect, returns the rect"""
+        for i, item in enumerate(self.visible()):
+            row_color = selected_color if self.top + i == self.selected else color
+            text = text_cache.render(font, self.label(item), row_color)
+            surface.blit(text, (self.rect.centerx - text.get_width() // 2, self.rect.y + i * self.row_height))
+        return self.rect
+
+
+class Layer:
+    """A pre-composed drawing that is rebuilt only when its inputs change
+
+    build(*inputs) is called on first use and again whenever get() sees
+    different inputs; in between the previous result is handed back as is.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self.builds = 0
+        self._inputs = None
+        self._result = None
+
+    def get(self, *inputs):
+        if self._result is None or inputs != self._inputs:
+            self._result = self.build(*inputs)
+            self._inputs = inputs
+            self.builds += 1
+        return self._result
+
+    def invalidate(self):
+        self._result = None
+
+
+class CrossFade:
+    """Timed fade from one keyed surface to the next, advanced one fixed step at a time
+
+    The main loop calls show(key) and update() once per simulation step and
+    reads amount(alpha) while drawing, so a fade runs alongside everything
+    else instead of blocking in a loop of its own.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.current = None
+        self.previous = None  # Key being faded out, None when no fade is running
+        self._step = 0
+
+    def show(self, key):
+        if key != self.current:
+            if self.current is not None:
+                self.previous = self.current
+                self._step = 0
+            self.current = key
+
+    def update(self):
+        if self.previous is not None:
+            self._step += 1
+            if self._step >= self.steps:
+                self.previous = None
+
+    def amount(self, alpha=0.0):
+        """How far the current key has faded in, 0 to 1, alpha blends between steps"""
+        if self.previous is None:
+            return 1.0
+        return min(1.0, (self._step + alpha) / self.steps)
+
+
+def varying_columns(surface):
+    """(start, stop) x ranges of surface whose pixels are not the same all the way down"""
+    pixels = pygame.surfarray.array2d(surface)
+    varying = (pixels != pixels[:, :1]).any(axis=1).tolist()
+    spans = []
+    for x, changes in enumerate(varying):
+        if not changes:
+            continue
+        if spans and spans[-1][1] == x:
+            spans[-1][1] = x + 1
+        else:
+            spans.append([x, x + 1])
+    return [tuple(span) for span in spans]
+
+
+class DirtyRects:
+    """Pushes only the screen areas drawn this frame instead of flipping the whole display
+
+    Areas from the previous frame are pushed again so whatever moved away
+    from them gets repainted. Call full() when everything changes at once
+    (screen transitions, biome changes); disabled trackers always flip.
+
+    A scrolled strip only dirties its columns that are not the same all the
+    way down: the road's asphalt and the grass between the roadside sprites
+    look the same at any scroll position, so they are never pushed.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._current = []
+        self._previous = []
+        self._full = True
+        self._columns = weakref.WeakKeyDictionary()  # Strip -> {factor: rects of its varying columns}
+
+    def add(self, rect):
+        if self.enabled:
+            self._current.append(pygame.Rect(rect))
+        return rect
+
+    def extend(self, rects):
+        if self.enabled:
+            self._current.extend(pygame.Rect(r) for r in rects)
+
+    def scrolled(self, strip, factor=1):
+        """Mark what scrolling strip vertically changes, in pixel blocks of factor when scaled up"""
+        if not self.enabled:
+            return
+        by_factor = self._columns.setdefault(strip, {})
+        if factor not in by_factor:
+            rects = []
+            for start, stop in varying_columns(strip):
+                left, right = start // factor * factor, -(-stop // factor) * factor  # Out to whole blocks
+                rects.append(pygame.Rect(left, 0, right - left, strip.get_height()))
+            by_factor[factor] = rects
+        self._current.extend(by_factor[factor])
+
+    def full(self):
+        self._full = True
+
+    def present(self):
+        if not self.enabled or self._full:
+            pygame.display.flip()
+            self._full = False
+        else:
+            pygame.display.update(self._previous + self._current)
+        self._previous = self._current
+        self._current = []
+
+
+class LowRes:
+    """A smaller framebuffer that takes blits in full-resolution coordinates
+
+    Drawing code stays unchanged: positions are divided by factor and each
+    source surface is shrunk once (nearest neighbour, like the pixel art it
+    holds) the first time it is drawn, then kept for as long as the source
+    lives. upscale() fills the display from it, factor times larger, once
+    per frame, so the scene costs about 1/factor² of the fill.
+    """
+
+    def __init__(self, size, factor=2):
+        width, height = size
+        if factor < 1:
+            raise ValueError(f"Scale factor must be at least 1, not {factor}")
+        if width % factor or height % factor:
+            raise ValueError(f"{width}x{height} does not divide by {factor}")
+        self.size = size
+        self.factor = factor
+        self.surface = pygame.Surface((width // factor, height // factor)).convert()
+        self._scaled = weakref.WeakKeyDictionary()
+
+    def get_size(self):
+        return self.size
+
+    def get_rect(self):
+        return pygame.Rect((0, 0), self.size)
+
+    def _shrink(self, source):
+        small = self._scaled.get(source)
+        if small is None:
+            w, h = source.get_size()
+            small = pygame.transform.scale(source, (max(1, w // self.factor), max(1, h // self.factor)))
+            self._scaled[source] = small
+        small.set_alpha(source.get_alpha())  # Set per frame for fades
+        return small
+
+    def blit(self, source, dest):
+        f = self.factor
+        r = self.surface.blit(self._shrink(source), (dest[0] / f, dest[1] / f))
+        return pygame.Rect(r.x * f, r.y * f, r.w * f, r.h * f)
+
+    def blits(self, sequence, doreturn=True):
+        rects = [self.blit(source, dest) for source, dest in sequence]
+        return rects if doreturn else None
+
+    def upscale(self, screen):
+        pygame.transform.scale(self.surface, screen.get_size(), screen)
@@ -0,0 +1,142 @@
+"""Compact input recordings of a game session and a headless replay checker
+
+A recording is the session seed, its tuning and the left/right input of
+every simulated frame, run-length encoded. Replaying feeds those inputs back
+through simulation.step and checks the final score and level still match.
+
+    python replay.py replays/*.rcr
+"""
+import sys
+import json
+import time
+import struct
+
+from simulation import FPS, GameData, step
+
+MAGIC = b'RCRP'
+VERSION = 3  # Bumped whenever simulation rules change, older files would not replay
+# magic, version, seed, frames, score, level, tuning json length
+HEADER = struct.Struct('<4sBIIIHH')
+
+
+class Recorder:
+    """Collects per-frame input for one session started with game_data.reset()"""
+
+    def __init__(self, game_data):
+        self.seed = game_data.seed
+        self.tuning = dict(game_data.tuning)
+        self.runs = []  # [input code, repeat count], code bit 0 = left, bit 1 = right
+        self.frames = 0
+
+    def add(self, left, right):
+        code = (1 if left else 0) | (2 if right else 0)
+        if self.runs and self.runs[-1][0] == code:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([code, 1])
+        self.frames += 1
+
+    def to_bytes(self, game_data):
+        return encode({
+            'seed': self.seed,
+            'tuning': self.tuning,
+            'frames': self.frames,
+            'score': game_data.score,
+            'level': game_data.current_level,
+            'runs': self.runs
+        })
+
+    def save(self, path, game_data):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes(game_data))
+
+
+def encode(recording):
+    tuning = json.dumps(recording['tuning'], separators=(',', ':')).encode()
+    out = bytearray(HEADER.pack(MAGIC, VERSION, recording['seed'], recording['frames'],
+                                recording['score'], recording['level'], len(tuning)))
+    out += tuning
+    for code, count in recording['runs']:
+        # Varint of (count << 2 | code), most runs fit in one or two bytes
+        value = (count << 2) | code
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode(data):
+    magic, version, seed, frames, score, level, tuning_len = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a replay file")
+    if version != VERSION:
+        raise ValueError(f"replay version {version} is not supported, expected {VERSION}")
+    pos = HEADER.size
+    tuning = json.loads(data[pos:pos + tuning_len])
+    pos += tuning_len
+    runs = []
+    value = shift = 0
+    for byte in data[pos:]:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            runs.append([value & 3, value >> 2])
+            value = shift = 0
+    return {
+        'seed': seed,
+        'tuning': tuning,
+        'frames': frames,
+        'score': score,
+        'level': level,
+        'runs': runs
+    }
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+def replay(recording):
+    """Re-run a recording headlessly, returns the finished GameData"""
+    game_data = GameData(tuning=recording['tuning'], seed=recording['seed'])
+    for code, count in recording['runs']:
+        left, right = bool(code & 1), bool(code & 2)
+        for _ in range(count):
+            step(game_data, left, right)
+    return game_data
+
+
+def verify(recording):
+    """Replay and compare with the recorded result, returns (ok, game_data)"""
+    game_data = replay(recording)
+    ok = (game_data.frames == recording['frames']
+          and game_data.score == recording['score']
+          and game_data.current_level == recording['level'])
+    return ok, game_data
+
+
+def main(paths):
+    failed = 0
+    for path in paths:
+        try:
+            recording = load(path)
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}")
+            failed += 1
+            continue
+        start = time.perf_counter()
+        ok, game_data = verify(recording)
+        elapsed = time.perf_counter() - start
+        speedup = game_data.frames / FPS / elapsed if elapsed else float('inf')
+        status = "OK" if ok else "MISMATCH"
+        print(f"{path}: {status} score {game_data.score}/{recording['score']} "
+              f"level {game_data.current_level + 1}/{recording['level'] + 1} "
+              f"({game_data.frames} frames, {speedup:,.0f}x real-time)")
+        failed += not ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
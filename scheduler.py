@@ -0,0 +1,67 @@
+"""Main loop pacing: a frame per tick while something moves, sleep otherwise
+
+Gameplay and the scrolling menus need a new frame every tick, so the loop
+gets its events after clock.tick(fps) as usual. Static screens (name entry,
+player select, leaderboard, welcome, pause) have nothing to draw until
+something happens, so there the loop blocks in pygame.event.wait until
+input arrives, a pygame timer event fires or max_wait passes, and redraw
+tells it whether the screen has to be drawn again.
+
+After idle_after seconds without input the menus stop scrolling and count
+as static too, until the next event.
+"""
+import time
+import pygame
+
+# Events that change nothing on a static screen, they still count as someone being there
+QUIET_EVENTS = (pygame.MOUSEMOTION, pygame.ACTIVEEVENT, pygame.WINDOWENTER, pygame.WINDOWLEAVE)
+
+
+class FrameScheduler:
+    """Decides whether each loop iteration ticks at fps or sleeps until an event"""
+
+    def __init__(self, fps, idle_after=0, max_wait=1000):
+        self.clock = pygame.time.Clock()
+        self.fps = fps  # 0 = uncapped
+        self.idle_after = idle_after  # Seconds, 0 = the menus never stop
+        self.max_wait = max_wait  # ms
+        self.redraw = True
+        self.last_input = time.perf_counter()
+        self._woken_by = None  # Event that ended the last sleep, handed out by events()
+
+    @property
+    def idle(self):
+        return bool(self.idle_after) and time.perf_counter() - self.last_input > self.idle_after
+
+    def invalidate(self):
+        """The static screen changed, draw it on the next iteration"""
+        self.redraw = True
+
+    def wake(self):
+        """Count as input, for activity that sends no events (keys held down while playing)"""
+        self.last_input = time.perf_counter()
+
+    def wait(self, animating):
+        """Wait for the frame cap or, on a static screen with nothing to redraw, for an event"""
+        if animating or self.redraw:
+            self.clock.tick(self.fps)
+            return
+        event = pygame.event.wait(self.max_wait)
+        if event.type != pygame.NOEVENT:
+            self._woken_by = event
+        self.clock.tick()  # So the next capped frame is timed from now, not from before the sleep
+
+    def events(self):
+        """This iteration's events, including the one that ended a sleep"""
+        events = pygame.event.get()
+        if self._woken_by is not None:
+            events.insert(0, self._woken_by)
+            self._woken_by = None
+        if events:
+            self.last_input = time.perf_counter()
+            if any(event.type not in QUIET_EVENTS for event in events):
+                self.redraw = True
+        return events
+
+    def drawn(self):
+        self.redraw = False
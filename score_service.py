@@ -0,0 +1,522 @@
+"""Leaderboard service for cabinets sharing one set of players, its client and a load generator
+
+The server keeps the players in a repository from players.py, so ranks and
+top-N come from the in-memory score index, and a burst of changes reaches
+disk in one write. Clients keep one connection each and speak
+newline-delimited JSON: {"id": n, "op": ..., ...} is answered with
+{"id": n, "result": ...} or {"id": n, "error": ...}.
+
+    python score_service.py serve --port 8765 --players players.json
+    python RetroCarGame.py --score-server=127.0.0.1:8765
+    python score_service.py load --clients 300 --seconds 10
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+from players import SAVE_FILE, generate_uid, open_repository
+from profiler import percentile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+LINE_LIMIT = 1 << 20  # Longest request or reply, a big batch or a page of players
+RETRY_DELAY = 2.0  # Seconds before unsent changes are tried again
+READ_CACHE = 256  # List reads whose last answer the client keeps
+
+
+def parse_address(address):
+    """(host, port) from "host:port", "host" or ":port" """
+    host, _, port = address.rpartition(':') if ':' in address else (address, '', '')
+    return host or DEFAULT_HOST, int(port) if port else DEFAULT_PORT
+
+
+class ScoreServer:
+    """Answers client requests from a player repository"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.clients = 0
+        self.requests = 0
+        self.changes = 0
+
+    def handle(self, request):
+        repo = self.repo
+        op = request['op']
+        if op == 'submit':
+            return self.submit(request['changes'])
+        if op == 'rank':
+            return repo.rank(request['uid'])
+        if op == 'top':
+            return repo.top(request.get('n', 10))
+        if op == 'ranked':
+            return repo.ranked(request['start'], request['stop'])
+        if op == 'around':
+            return repo.around(request['uid'], request.get('n', 2))
+        if op == 'count':
+            return repo.count(request.get('prefix', ""))
+        if op == 'find':
+            return repo.find(request['prefix'], request['start'], request['stop'])
+        if op == 'find_ranked':
+            return repo.find_ranked(request['prefix'], request['start'], request['stop'])
+        if op == 'get':
+            return repo.get(request['uid'])
+        if op == 'first':
+            return repo.first()
+        raise ValueError(f"unknown op {op!r}")
+
+    def submit(self, changes):
+        """Apply a batch of ["new", uid, username] and ["score", uid, score] changes
+
+        Only the best score per player in the batch is applied. Both kinds
+        are idempotent, so a client can safely resend a batch it never got
+        an answer for.
+        """
+        best = {}
+        for change in changes:
+            if change[0] == 'new':
+                if self.repo.get(change[1]) is None:
+                    self.repo.new_player(change[2], uid=change[1])
+            elif change[0] == 'score':
+                best[change[1]] = max(change[2], best.get(change[1], 0))
+        for uid, score in best.items():
+            self.repo.save_score(uid, score)
+        self.changes += len(changes)
+        return len(changes)
+
+    async def serve_client(self, reader, writer):
+        self.clients += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    reply = {'id': request.get('id'), 'result': self.handle(request)}
+                except (ValueError, KeyError, TypeError, IndexError, AttributeError) as e:
+                    reply = {'id': request.get('id') if isinstance(request, dict) else None, 'error': str(e)}
+                self.requests += 1
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (OSError, ValueError):
+            pass  # Dropped connection or an oversized line
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def report(self, every=10):
+        last = 0
+        while True:
+            await asyncio.sleep(every)
+            if self.requests != last:
+                print(f"{self.clients} clients, {(self.requests - last) / every:,.0f} requests/s, "
+                      f"{self.changes} changes, {self.repo.count()} players")
+                last = self.requests
+
+
+async def serve(host, port, path):
+    repo = open_repository(path)
+    server = ScoreServer(repo)
+    try:
+        listener = await asyncio.start_server(server.serve_client, host, port, limit=LINE_LIMIT)
+        print(f"Score server on {host}:{port} with {repo.count()} players from {path}")
+        reporter = asyncio.create_task(server.report())
+        async with listener:
+            await listener.serve_forever()
+        reporter.cancel()
+    finally:
+        repo.close()
+
+
+class ScoreClient:
+    """Player repository backed by a score server, with the same methods as those in players.py
+
+    Changes update the game's player dicts at once and are sent in batches
+    by a background event loop, so the game loop never waits on the
+    network. rank() answers from a cache that refreshes in the background.
+    The list reads (count, find, ranked...) reuse a reply younger than
+    read_ttl, otherwise ask again and wait read_wait at most, then answer
+    from the last reply to the same read and call on_update(), on the
+    client's thread, if the late reply turns out different. Only get() and
+    first() wait for the server, up to timeout.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, flush_delay=0.2, timeout=2.0, rank_ttl=1.0,
+                 read_wait=0.005, read_ttl=1.0, on_update=None):
+        self.host = host
+        self.port = port
+        self.flush_delay = flush_delay  # Seconds to gather changes into one batch
+        self.timeout = timeout
+        self.rank_ttl = rank_ttl  # Seconds a cached rank is shown before it is refreshed
+        self.read_wait = read_wait  # Seconds a list read waits before answering from the cache
+        self.read_ttl = read_ttl  # Seconds a list read's reply is reused without asking again
+        self.on_update = on_update
+        self._players = {}  # uid -> the one dict handed out for that player
+        self._ranks = {}  # uid -> (rank, time fetched)
+        self._refreshing = set()
+        self._reads = {}  # (op, args) -> future of its latest request
+        self._results = {}  # (op, args) -> (last reply, time received), oldest first
+        self._late = set()  # Reads given up on whose reply is still coming
+        self._results_lock = threading.Lock()
+        self._healthy = True  # Errors are printed once per outage
+        # Everything below belongs to the event loop's thread
+        self._pending = []
+        self._connection = None
+        self._replies = {}
+        self._next_id = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="score-client", daemon=True)
+        self._thread.start()
+        self._run(self._setup()).result()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _setup(self):
+        self._wake = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._connect_lock = asyncio.Lock()
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def _report(self, e):
+        if self._healthy:
+            print(f"Score server error: {e!r}")
+            self._healthy = False
+
+    def _player(self, data):
+        """The dict for a player the server sent, so the game's copy sees later updates"""
+        if data is None:
+            return None
+        player_data = self._players.get(data['uid'])
+        if player_data is None:
+            player_data = self._players[data['uid']] = data
+        else:
+            player_data['username'] = data['username']
+            player_data['score'] = max(player_data['score'], data['score'])
+        return player_data
+
+    # --- Connection, on the event loop ---
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._connection is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT), self.timeout)
+                self._connection = writer
+                asyncio.create_task(self._read_replies(reader, writer))
+            return self._connection
+
+    async def _read_replies(self, reader, writer):
+        error = ConnectionError("score server closed the connection")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                future = self._replies.pop(reply['id'], None)
+                if future is None or future.done():
+                    continue  # Timed out already
+                if 'error' in reply:
+                    future.set_exception(ValueError(reply['error']))
+                else:
+                    future.set_result(reply['result'])
+        except (OSError, ValueError) as e:
+            error = e
+        if self._connection is writer:
+            self._connection = None
+        writer.close()
+        for future in self._replies.values():
+            if not future.done():
+                future.set_exception(error)
+        self._replies.clear()
+
+    async def _call(self, op, **args):
+        writer = await self._connect()
+        self._next_id += 1
+        request_id = self._next_id
+        future = self._replies[request_id] = self._loop.create_future()
+        writer.write(json.dumps(dict(id=request_id, op=op, **args)).encode() + b"\n")
+        try:
+            await writer.drain()
+            result = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._replies.pop(request_id, None)
+        self._healthy = True
+        return result
+
+    def _request(self, op, default=None, **args):
+        """Result of op from the server, or default if it cannot be reached in time"""
+        future = self._run(self._call(op, **args))
+        try:
+            return future.result(self.timeout * 2)
+        except (OSError, ValueError, TimeoutError) as e:
+            future.cancel()
+            self._report(e)
+            return default
+
+    def _read(self, op, default=None, **args):
+        """Result of op from the server if it comes within read_wait, otherwise the last one known"""
+        key = (op, tuple(sorted(args.items())))
+        with self._results_lock:
+            cached = self._results.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.read_ttl:
+            return cached[0]
+        future = self._reads.get(key)
+        if future is None or future.done():
+            if len(self._reads) >= READ_CACHE:
+                self._reads = {k: f for k, f in self._reads.items() if not f.done()}
+            future = self._reads[key] = self._run(self._call(op, **args))
+        try:
+            result = future.result(self.read_wait)
+        except TimeoutError:
+            if key not in self._late:
+                self._late.add(key)
+                future.add_done_callback(lambda done: self._arrived(key, done))
+            return cached[0] if cached else default
+        except (OSError, ValueError) as e:
+            self._report(e)
+            return cached[0] if cached else default
+        self._keep(key, result)
+        return result
+
+    def _arrived(self, key, future):
+        """A read the caller stopped waiting for is done, on the event loop"""
+        self._late.discard(key)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self._report(future.exception())
+            return
+        # Only news is worth a redraw, or a slow server would keep an open list asking again
+        if self._keep(key, future.result()) and self.on_update is not None:
+            self.on_update()
+
+    def _keep(self, key, result):
+        """Store a reply, returns True if it differs from the one before"""
+        with self._results_lock:
+            old = self._results.pop(key, None)
+            self._results[key] = (result, time.monotonic())
+            if len(self._results) > READ_CACHE:
+                del self._results[next(iter(self._results))]
+        return old is None or old[0] != result
+
+    # --- Batched changes ---
+
+    def _queue(self, change):
+        def add():
+            self._pending.append(change)
+            self._wake.set()
+        self._loop.call_soon_threadsafe(add)
+
+    async def _send_loop(self):
+        while True:
+            await self._wake.wait()
+            # Let a burst of changes pile up so they go in one request
+            await asyncio.sleep(self.flush_delay)
+            self._wake.clear()
+            if not await self._send_pending():
+                await asyncio.sleep(RETRY_DELAY)
+                self._wake.set()
+
+    async def _send_pending(self):
+        async with self._send_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return True
+            try:
+                await self._call('submit', changes=batch)
+            except (OSError, ValueError, TimeoutError) as e:
+                self._report(e)
+                self._pending[:0] = batch  # Kept for the next try
+                return False
+        # Ranks may have moved, refresh on next use
+        self._ranks = {uid: (rank, 0) for uid, (rank, _) in self._ranks.items()}
+        return True
+
+    def flush(self):
+        """Block until every change made so far has reached the server, or timeout passes"""
+        try:
+            self._run(self._send_pending()).result(self.timeout * 2)
+        except TimeoutError as e:
+            self._report(e)
+
+    def close(self):
+        self.flush()
+        self._run(self._shutdown()).result(self.timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _shutdown(self):
+        self._sender.cancel()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    # --- Reads ---
+
+    def rank(self, uid):
+        """Last known rank, never waits: a stale one is refreshed in the background"""
+        cached = self._ranks.get(uid)
+        if (cached is None or time.monotonic() - cached[1] > self.rank_ttl) and uid not in self._refreshing:
+            self._refreshing.add(uid)
+            self._run(self._refresh_rank(uid))
+        return cached[0] if cached else None
+
+    async def _refresh_rank(self, uid):
+        try:
+            rank = await self._call('rank', uid=uid)
+        except (OSError, ValueError, TimeoutError) as e:
+            self._report(e)
+            rank = self._ranks.get(uid, (None, 0))[0]
+        self._ranks[uid] = (rank, time.monotonic())
+        self._refreshing.discard(uid)
+
+    def get(self, uid):
+        return self._player(self._request('get', uid=uid)) or self._players.get(uid)
+
+    def first(self):
+        return self._player(self._request('first')) or next(iter(self._players.values()), None)
+
+    def all(self):
+        return self.find("", 0, self.count())
+
+    def top(self, n=10):
+        return [self._player(p) for p in self._read('top', [], n=n)]
+
+    def around(self, uid, n=2):
+        return [(rank, self._player(p)) for rank, p in self._read('around', [], uid=uid, n=n)]
+
+    def ranked(self, start, stop):
+        return [(rank, self._player(p)) for rank, p in self._read('ranked', [], start=start, stop=stop)]
+
+    def count(self, prefix=""):
+        return self._read('count', 0, prefix=prefix)
+
+    def find(self, prefix, start, stop):
+        return [self._player(p) for p in self._read('find', [], prefix=prefix, start=start, stop=stop)]
+
+    def find_ranked(self, prefix, start, stop):
+        return [(rank, self._player(p)) for rank, p in self._read(
+            'find_ranked', [], prefix=prefix, start=start, stop=stop)]
+
+    # --- Writes, applied here at once and sent in the next batch ---
+
+    def new_player(self, username="Player One"):
+        uid = generate_uid()
+        player_data = self._players[uid] = {"uid": uid, "username": username, "score": 0}
+        self._queue(['new', uid, username])
+        return player_data
+
+    def save_score(self, uid, score):
+        player_data = self._players.get(uid) or self.get(uid)
+        if player_data is None or score <= player_data['score']:
+            return False
+        player_data['score'] = score
+        self._queue(['score', uid, score])
+        return True
+
+
+# --- Load generator ---
+
+async def simulated_cabinet(host, port, name, seconds, rate, rng, latencies, errors):
+    """One client playing games: a score batch now and then, rank and leaderboard reads in between"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+    except OSError as e:
+        errors.append(repr(e))
+        return
+    next_id = 0
+
+    async def call(op, label=None, **args):
+        nonlocal next_id
+        next_id += 1
+        start = time.perf_counter()
+        writer.write(json.dumps(dict(id=next_id, op=op, **args)).encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.setdefault(label or op, []).append((time.perf_counter() - start) * 1000)
+        if 'error' in reply:
+            errors.append(reply['error'])
+
+    uid = generate_uid()
+    score = 0
+    deadline = time.perf_counter() + seconds
+    try:
+        # Every client registers at once, timed apart from the steady traffic
+        await call('submit', 'register', changes=[['new', uid, name]])
+        while time.perf_counter() < deadline:
+            # Think time with random gaps, so the clients do not move in lockstep
+            await asyncio.sleep(rng.expovariate(rate))
+            roll = rng.random()
+            if roll < 0.3:
+                changes = []
+                for _ in range(rng.randint(1, 4)):
+                    score += rng.randint(0, 30)
+                    changes.append(['score', uid, score])
+                await call('submit', changes=changes)
+            elif roll < 0.8:
+                await call('rank', uid=uid)
+            elif roll < 0.95:
+                await call('top', n=10)
+            else:
+                await call('find_ranked', prefix=name[:3], start=0, stop=9)
+    except (OSError, ValueError) as e:
+        errors.append(repr(e))
+    finally:
+        writer.close()
+
+
+async def load(host, port, clients, seconds, rate, seed):
+    rng = random.Random(seed)
+    latencies = {}
+    errors = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        simulated_cabinet(host, port, f"load{i:05d}", seconds, rate, random.Random(rng.random()), latencies, errors)
+        for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    total = sum(len(times) for times in latencies.values())
+    print(f"{clients} clients, {total} requests in {elapsed:.1f}s ({total / elapsed:,.0f}/s), {len(errors)} errors")
+    for op, times in sorted(latencies.items()):
+        times.sort()
+        print(f"  {op:12} {len(times):8} calls  p50 {percentile(times, 50):7.2f} ms  "
+              f"p95 {percentile(times, 95):7.2f} ms  p99 {percentile(times, 99):7.2f} ms")
+    for error in sorted(set(errors))[:5]:
+        print(f"  error: {error}")
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score service for several cabinets")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_cmd = commands.add_parser('serve', help="run the score server")
+    serve_cmd.add_argument('--host', default=DEFAULT_HOST, help="0.0.0.0 to accept cabinets on the LAN")
+    serve_cmd.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_cmd.add_argument('--players', default=SAVE_FILE, help="players.json or a .db file")
+    load_cmd = commands.add_parser('load', help="simulate many cabinets against a running server")
+    load_cmd.add_argument('--host', default=DEFAULT_HOST)
+    load_cmd.add_argument('--port', type=int, default=DEFAULT_PORT)
+    load_cmd.add_argument('--clients', type=int, default=300)
+    load_cmd.add_argument('--seconds', type=float, default=10)
+    load_cmd.add_argument('--rate', type=float, default=5, help="requests per second per client")
+    load_cmd.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'serve':
+            asyncio.run(serve(args.host, args.port, args.players))
+            return 0
+        return asyncio.run(load(args.host, args.port, args.clients, args.seconds, args.rate, args.seed))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+import math
+import os
+import random
+import time
+import numpy as np
+
+# Keep the import quiet when used from tools
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame
+
+# Game constants
+WIDTH, HEIGHT = 720, 600
+ROAD_X = 98
+ROAD_WIDTH = 350
+ROAD_SCROLL_SPEED = 5
+FPS = 60
+CAR_WIDTH, CAR_HEIGHT = 40, 60
+PLAYER_CAR_WIDTH, PLAYER_CAR_HEIGHT = 64, 64
+LEVEL_SCORE = 20  # Points needed for each level
+
+# Difficulty knobs, overridable per GameData for tuning runs
+DEFAULT_TUNING = {
+    'base_min_cars': 2,
+    'base_max_cars': 3,
+    'speed_growth': 2.2,  # Enemy speed multiplier per level
+    'level_score': LEVEL_SCORE
+}
+
+
+# Lane ids index these keys, which double as the sprite keys in assets['enemy_cars']
+LANES = ('down_left', 'down_right')
+LEFT_LANE, RIGHT_LANE = 0, 1
+# Respawn x ranges, inclusive, indexed by lane id
+RESPAWN_X_LOW = np.array([ROAD_X, ROAD_X + (ROAD_WIDTH // 2) + 10])
+RESPAWN_X_HIGH = np.array([ROAD_X + (ROAD_WIDTH // 2) - 10, ROAD_X + ROAD_WIDTH - CAR_WIDTH])
+RESPAWN_X_LOW_LIST, RESPAWN_X_HIGH_LIST = RESPAWN_X_LOW.tolist(), RESPAWN_X_HIGH.tolist()
+# Enemy counts from which NumPy arrays beat plain lists, see EnemyStore
+VECTOR_MIN_CARS = 16
+
+
+def random_ints(rng, low, high, size):
+    """size uniform integers in [low, high] as floats, bounds may be arrays
+
+    Much cheaper than Generator.integers for the handful drawn per frame.
+    """
+    return np.floor(low + rng.random(size) * (np.asarray(high) - low + 1))
+
+
+def random_int(rng, low, high):
+    """One random_ints() draw for scalar bounds, same value and same draw from rng"""
+    return float(math.floor(low + rng.random() * (high - low + 1)))
+
+
+class EnemyStore:
+    """Enemy cars as parallel columns, one slot per car
+
+    The handful of cars in early levels steps faster as plain lists, where
+    NumPy's per-call overhead would dominate, so the columns are lists below
+    VECTOR_MIN_CARS and arrays from there up. vectorized tells which.
+    """
+
+    def __init__(self, x, y, speed, lane):
+        self.vectorized = len(x) >= VECTOR_MIN_CARS
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.speed = np.asarray(speed, dtype=np.float64)
+        self.lane = np.asarray(lane, dtype=np.int8)
+        if not self.vectorized:
+            self.x, self.y, self.speed, self.lane = (
+                self.x.tolist(), self.y.tolist(), self.speed.tolist(), self.lane.tolist())
+        self.sprite = self.lane.copy()  # Sprite id, one sprite per lane for now
+
+    def __len__(self):
+        return len(self.x)
+
+
+class GameData:
+    """Everything the game simulates, with no dependency on a display"""
+
+    def __init__(self, tuning=None, seed=None):
+        self.tuning = dict(DEFAULT_TUNING, **(tuning or {}))
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        # Every gameplay draw comes from this session's generator, so a seed
+        # plus the player's inputs reproduces a whole run
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = np.random.default_rng(self.seed)
+        self.current_level = 0
+        self.player_speed = 5
+        self.enemy_speed_left = 6
+        self.enemy_speed_right = 2
+        self.base_min_cars = self.tuning['base_min_cars']
+        self.base_max_cars = self.tuning['base_max_cars']
+        self.speed_growth = self.tuning['speed_growth']
+        self.level_score = self.tuning['level_score']
+        self.score = 0
+        self.frames = 0
+        self.lane_speeds = np.array([self.enemy_speed_left, self.enemy_speed_right], dtype=np.float64)
+        self.just_leveled_up = False
+
+        self.player_rect = pygame.Rect(
+            ROAD_X + (ROAD_WIDTH // 2) - (CAR_WIDTH // 2),
+            HEIGHT - 120,
+            CAR_WIDTH,
+            CAR_HEIGHT
+        )
+
+        self.setup_level()
+
+    def setup_level(self):
+        # Cars increase every 5 levels
+        extra_cars = self.current_level // 5
+        min_cars = self.base_min_cars + extra_cars
+        max_cars = self.base_max_cars + extra_cars
+
+        # Speed grows geometrically per level
+        self.enemy_speed_left = 6 * (self.speed_growth ** self.current_level)
+        self.enemy_speed_right = 2 * (self.speed_growth ** self.current_level)
+
+        self.lane_speeds = np.array([self.enemy_speed_left, self.enemy_speed_right], dtype=np.float64)
+
+        left_lane = ROAD_X
+        right_lane = ROAD_X + ROAD_WIDTH - CAR_WIDTH
+        mid_point = ROAD_X + (ROAD_WIDTH // 2) - (CAR_WIDTH // 2)
+
+        rng = self.rng
+        count = int(random_ints(rng, min_cars, max_cars, 1)[0])
+        lane = np.where(rng.random(count) < 0.5, LEFT_LANE, RIGHT_LANE)
+        x = np.where(
+            lane == LEFT_LANE,
+            random_ints(rng, left_lane, mid_point - 10, count),
+            random_ints(rng, mid_point + 10, right_lane, count)
+        )
+        y = random_ints(rng, -300, -50, count)
+        self.enemies = EnemyStore(x, y, self.lane_speeds[lane], lane)
+
+
+def swept_collision(player_rect, prev_player_x, x, y_from, y_to):
+    """Continuous collision of the player against every enemy's move this frame
+
+    Enemies only travel down and the player only sideways, so each pair is
+    checked over the whole step instead of at its end, however far a car
+    moves in one frame. Runs as one vectorized pass over all enemies.
+    """
+    py = player_rect.y
+    pw, ph = player_rect.size
+    # Only enemies passing the player's rows this frame can hit
+    band = (y_to > py - CAR_HEIGHT) & (y_from < py + ph)
+    if not np.count_nonzero(band):
+        return False
+    x, y_from, y_to = x[band], y_from[band], y_to[band]
+
+    # Times in [0, 1] where the boxes overlap vertically; enemies always move down
+    dy = y_to - y_from
+    enter = (py - CAR_HEIGHT - y_from) / dy
+    leave = (py + ph - y_from) / dy
+
+    # And horizontally, while the player slides over from prev_player_x
+    dx = player_rect.x - prev_player_x
+    if dx == 0:
+        hit = (x - pw < prev_player_x) & (prev_player_x < x + CAR_WIDTH)
+    else:
+        t_left = (x - pw - prev_player_x) / dx
+        t_right = (x + CAR_WIDTH - prev_player_x) / dx
+        if dx < 0:
+            t_left, t_right = t_right, t_left
+        enter = np.maximum(enter, t_left)
+        leave = np.minimum(leave, t_right)
+        hit = True
+    enter = np.maximum(enter, 0.0)
+    leave = np.minimum(leave, 1.0)
+    return bool((hit & (enter < leave)).any())
+
+
+def swept_collision_moves(player_rect, prev_player_x, moves):
+    """swept_collision() for a few enemies, moves holds (x, y_from, y_to) per enemy in the player's rows"""
+    py = player_rect.y
+    pw, ph = player_rect.size
+    dx = player_rect.x - prev_player_x
+    for x, y_from, y_to in moves:
+        dy = y_to - y_from
+        enter = (py - CAR_HEIGHT - y_from) / dy
+        leave = (py + ph - y_from) / dy
+        if dx == 0:
+            if not x - pw < prev_player_x < x + CAR_WIDTH:
+                continue
+        else:
+            t_left = (x - pw - prev_player_x) / dx
+            t_right = (x + CAR_WIDTH - prev_player_x) / dx
+            if dx < 0:
+                t_left, t_right = t_right, t_left
+            enter = max(enter, t_left)
+            leave = min(leave, t_right)
+        if max(enter, 0.0) < min(leave, 1.0):
+            return True
+    return False
+
+
+def step(game_data, left=False, right=False):
+    """Advance gameplay by one frame, returns True if the player crashed"""
+    crashed = move(game_data, left, right)
+    check_level_up(game_data)
+    return crashed
+
+
+def move(game_data, left=False, right=False):
+    """Steer the player, move and respawn enemies and score, returns True on a crash"""
+    player_rect = game_data.player_rect
+    prev_player_x = player_rect.x
+    if left:
+        player_rect.x = max(ROAD_X, player_rect.x - game_data.player_speed)
+    if right:
+        player_rect.x = min(ROAD_X + ROAD_WIDTH - CAR_WIDTH, player_rect.x + game_data.player_speed)
+
+    # Move every enemy down at its lane's speed
+    enemies = game_data.enemies
+    if enemies.vectorized:
+        crashed = move_enemy_arrays(game_data, enemies, prev_player_x)
+    else:
+        crashed = move_enemy_lists(game_data, enemies, prev_player_x)
+    game_data.frames += 1
+    return crashed
+
+
+def move_enemy_arrays(game_data, enemies, prev_player_x):
+    y_from = enemies.y
+    y_to = y_from + enemies.speed
+    crashed = swept_collision(game_data.player_rect, prev_player_x, enemies.x, y_from, y_to)
+    enemies.y = y_to
+
+    # Past the bottom of the screen means a respawn in the same lane, and a point
+    gone = (y_to > HEIGHT).nonzero()[0]
+    if len(gone):
+        rng = game_data.rng
+        n = len(gone)
+        lane = enemies.lane[gone]
+        enemies.y[gone] = random_ints(rng, -300, -50, n)
+        enemies.x[gone] = random_ints(rng, RESPAWN_X_LOW[lane], RESPAWN_X_HIGH[lane], n)
+        enemies.speed[gone] = game_data.lane_speeds[lane]
+        game_data.score += n
+    return crashed
+
+
+def move_enemy_lists(game_data, enemies, prev_player_x):
+    """move_enemy_arrays() one car at a time, same results and the same draws from the rng"""
+    player_rect = game_data.player_rect
+    sweep_top = player_rect.y - CAR_HEIGHT
+    sweep_bottom = player_rect.bottom
+    ys = enemies.y
+    moves = gone = None
+    for i, (x, y_from, speed) in enumerate(zip(enemies.x, ys, enemies.speed)):
+        y_to = y_from + speed
+        ys[i] = y_to
+        if y_to > sweep_top and y_from < sweep_bottom:
+            if moves is None:
+                moves = []
+            moves.append((x, y_from, y_to))
+        if y_to > HEIGHT:
+            if gone is None:
+                gone = []
+            gone.append(i)
+    crashed = moves is not None and swept_collision_moves(player_rect, prev_player_x, moves)
+
+    if gone is not None:
+        # All the y draws before the x draws, like the bulk draws of move_enemy_arrays()
+        rng = game_data.rng
+        for i in gone:
+            ys[i] = random_int(rng, -300, -50)
+        for i in gone:
+            lane = enemies.lane[i]
+            enemies.x[i] = random_int(rng, RESPAWN_X_LOW_LIST[lane], RESPAWN_X_HIGH_LIST[lane])
+            enemies.speed[i] = float(game_data.lane_speeds[lane])
+        game_data.score += len(gone)
+    return crashed
+
+
+def check_level_up(game_data):
+    """Improved infinite level progression"""
+    level_score = game_data.level_score
+    if game_data.score > 0 and game_data.score % level_score == 0 and not game_data.just_leveled_up:
+        game_data.just_leveled_up = True
+        game_data.current_level += 1
+        game_data.setup_level()
+    else:
+        if game_data.score % (level_score // 2 or 1) != 0:
+            game_data.just_leveled_up = False
+
+
+def play(game_data, policy=None, max_frames=FPS * 60 * 10):
+    """Run one game to a crash (or max_frames) as fast as possible
+
+    policy(game_data) returns (left, right); None holds still.
+    Returns the number of frames survived.
+    """
+    while game_data.frames < max_frames:
+        left, right = policy(game_data) if policy else (False, False)
+        if step(game_data, left, right):
+            break
+    return game_data.frames
+
+
+def random_policy(game_data):
+    r = random.random()
+    return r < 0.3, r > 0.7
+
+
+def dodge_policy(game_data):
+    """Scripted driver: steer away from the closest car coming down on the player"""
+    player_rect = game_data.player_rect
+    enemies = game_data.enemies
+    x, y = np.asarray(enemies.x), np.asarray(enemies.y)
+    near = ((y <= player_rect.bottom)
+            & (x + CAR_WIDTH + 10 >= player_rect.left)
+            & (x - 10 <= player_rect.right))
+    if not near.any():
+        return False, False
+    candidates = np.flatnonzero(near)
+    threat = candidates[np.argmax(y[candidates])]
+    threat_x = x[threat]
+    room_left = threat_x - ROAD_X
+    room_right = ROAD_X + ROAD_WIDTH - (threat_x + CAR_WIDTH)
+    go_left = room_left >= CAR_WIDTH + 10 and (
+        threat_x + CAR_WIDTH / 2 > player_rect.centerx or room_right < CAR_WIDTH + 10)
+    return go_left, not go_left
+
+
+POLICIES = {
+    'idle': None,
+    'random': random_policy,
+    'dodge': dodge_policy
+}
+
+
+if __name__ == "__main__":
+    # Quick throughput check: python simulation.py
+    data = GameData()
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 2:
+        data.reset()
+        frames += play(data, random_policy, max_frames=5000)
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames in {elapsed:.2f}s ({frames / elapsed:,.0f} frames/s)")
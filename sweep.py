@@ -0,0 +1,137 @@
+"""Difficulty sweep: play thousands of headless games per tuning on every core
+
+Example:
+    python sweep.py --min-cars 1,2,3 --max-cars 3,4 --speed-growth 1.5,2.2 \
+        --level-score 20,30 --seeds 8 --games 500 --policy dodge
+"""
+import os
+import json
+import time
+import random
+import argparse
+import itertools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from profiler import percentile
+from simulation import FPS, DEFAULT_TUNING, GameData, POLICIES, play
+
+
+def run_batch(task):
+    """Worker: play a batch of games for one tuning and seed"""
+    tuning, seed, games, policy_name, max_frames = task
+    random.seed(seed)
+    policy = POLICIES[policy_name]
+    game_data = GameData(tuning=tuning)
+    frames = []
+    scores = Counter()
+    levels = Counter()
+    for _ in range(games):
+        game_data.reset()
+        frames.append(play(game_data, policy, max_frames))
+        scores[game_data.score] += 1
+        levels[game_data.current_level + 1] += 1
+    return tuning, frames, scores, levels
+
+
+def histogram_stats(counts):
+    values = sorted(counts.elements())
+    return {
+        'mean': round(sum(values) / len(values), 2),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'max': values[-1],
+        'hist': {str(k): counts[k] for k in sorted(counts)}
+    }
+
+
+def summarize(tuning, frames, scores, levels, max_frames):
+    frames.sort()
+    return {
+        'tuning': tuning,
+        'games': len(frames),
+        'survival_s': {
+            'mean': round(sum(frames) / len(frames) / FPS, 2),
+            'p50': round(percentile(frames, 50) / FPS, 2),
+            'p90': round(percentile(frames, 90) / FPS, 2),
+            'p99': round(percentile(frames, 99) / FPS, 2),
+            'timeouts': sum(1 for f in frames if f >= max_frames)
+        },
+        'score': histogram_stats(scores),
+        'level': histogram_stats(levels)
+    }
+
+
+def build_grid(args):
+    grid = []
+    for min_cars, max_cars, growth, level_score in itertools.product(
+            args.min_cars, args.max_cars, args.speed_growth, args.level_score):
+        if min_cars > max_cars:
+            continue
+        grid.append({
+            'base_min_cars': min_cars,
+            'base_max_cars': max_cars,
+            'speed_growth': growth,
+            'level_score': level_score
+        })
+    return grid
+
+
+def run_sweep(grid, seeds, games, policy, max_frames, workers=None):
+    tasks = [(tuning, seed, games, policy, max_frames) for tuning in grid for seed in seeds]
+    merged = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for tuning, frames, scores, levels in pool.map(run_batch, tasks):
+            key = json.dumps(tuning, sort_keys=True)
+            if key not in merged:
+                merged[key] = (tuning, [], Counter(), Counter())
+            merged[key][1].extend(frames)
+            merged[key][2].update(scores)
+            merged[key][3].update(levels)
+    return [summarize(t, f, s, l, max_frames) for t, f, s, l in merged.values()]
+
+
+def number_list(cast):
+    return lambda text: [cast(v) for v in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep difficulty settings over headless games")
+    parser.add_argument('--min-cars', type=number_list(int), default=[DEFAULT_TUNING['base_min_cars']])
+    parser.add_argument('--max-cars', type=number_list(int), default=[DEFAULT_TUNING['base_max_cars']])
+    parser.add_argument('--speed-growth', type=number_list(float), default=[DEFAULT_TUNING['speed_growth']])
+    parser.add_argument('--level-score', type=number_list(int), default=[DEFAULT_TUNING['level_score']])
+    parser.add_argument('--seeds', type=int, default=os.cpu_count(), help="seeds per tuning, one batch each")
+    parser.add_argument('--games', type=int, default=1000, help="games per seed")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='dodge')
+    parser.add_argument('--max-frames', type=int, default=FPS * 60 * 5, help="cap on a single game")
+    parser.add_argument('--workers', type=int, default=None, help="defaults to every core")
+    parser.add_argument('--out', default="sweep_results.json")
+    args = parser.parse_args()
+
+    grid = build_grid(args)
+    start = time.perf_counter()
+    results = run_sweep(grid, range(args.seeds), args.games, args.policy, args.max_frames, args.workers)
+    elapsed = time.perf_counter() - start
+
+    with open(args.out, "w") as f:
+        json.dump({
+            'policy': args.policy,
+            'seeds': args.seeds,
+            'games_per_seed': args.games,
+            'max_frames': args.max_frames,
+            'elapsed_s': round(elapsed, 2),
+            'results': results
+        }, f, separators=(',', ':'))
+
+    for r in results:
+        t = r['tuning']
+        print(f"cars {t['base_min_cars']}-{t['base_max_cars']} growth {t['speed_growth']} "
+              f"level every {t['level_score']}: survival p50 {r['survival_s']['p50']}s, "
+              f"score p50 {r['score']['p50']}, level p90 {r['level']['p90']}")
+    total = sum(r['games'] for r in results)
+    print(f"{total} games in {elapsed:.1f}s, results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
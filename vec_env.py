@@ -0,0 +1,238 @@
+"""Many independent games stepped in lockstep, for training and evaluating drivers
+
+Every world follows the same rules as simulation.move and check_level_up,
+but the state of all worlds lives in arrays, so one step() advances all of
+them with a handful of NumPy operations and no display.
+
+    env = VecEnv(1024, seed=1)
+    obs = env.reset()
+    obs, rewards, dones = env.step(actions)  # actions: input codes, bit 0 left, bit 1 right
+
+python vec_env.py runs a throughput check.
+"""
+import time
+import numpy as np
+
+from simulation import (
+    HEIGHT, ROAD_X, ROAD_WIDTH, CAR_WIDTH, CAR_HEIGHT, DEFAULT_TUNING,
+    LEFT_LANE, RIGHT_LANE, RESPAWN_X_LOW, RESPAWN_X_HIGH, random_ints
+)
+
+PLAYER_START_X = ROAD_X + (ROAD_WIDTH // 2) - (CAR_WIDTH // 2)
+PLAYER_Y = HEIGHT - 120
+PLAYER_SPEED = 5
+PLAYER_X_MIN, PLAYER_X_MAX = ROAD_X, ROAD_X + ROAD_WIDTH - CAR_WIDTH
+# Unused car slots wait far above the road with no speed, so they never collide or respawn
+PARKED_Y = -1e9
+# Enemy x ranges, inclusive, when a level is set up, indexed by lane id
+SETUP_X_LOW = np.array([ROAD_X, PLAYER_START_X + 10])
+SETUP_X_HIGH = np.array([PLAYER_START_X - 10, ROAD_X + ROAD_WIDTH - CAR_WIDTH])
+
+
+class VecEnv:
+    """N games as arrays: player x, enemy slots per world, score and level-up state
+
+    Worlds that crash (or reach max_frames) start a new game within the same
+    step, their final score and frame count are left in last_score and
+    last_frames. The reward is the points scored in the step, plus
+    crash_reward on a crash.
+
+    Observations are float32 rows of player x, level and, for the
+    observed_cars closest enemies still above the player's bottom edge,
+    (present, x relative to the player, y, speed), nearest first.
+    """
+
+    def __init__(self, num_worlds, tuning=None, seed=None, observed_cars=4, crash_reward=-1.0, max_frames=None):
+        self.num_worlds = num_worlds
+        self.tuning = dict(DEFAULT_TUNING, **(tuning or {}))
+        self.observed_cars = observed_cars
+        self.crash_reward = crash_reward
+        self.max_frames = max_frames
+        self.rng = np.random.default_rng(seed)
+        self.base_min_cars = self.tuning['base_min_cars']
+        self.base_max_cars = self.tuning['base_max_cars']
+        self.speed_growth = self.tuning['speed_growth']
+        self.level_score = self.tuning['level_score']
+
+        n = num_worlds
+        self.player_x = np.full(n, PLAYER_START_X, dtype=np.float64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.int64)
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.just_leveled_up = np.zeros(n, dtype=bool)
+        self.lane_speeds = np.zeros((n, 2))
+        self.last_score = np.zeros(n, dtype=np.int64)
+        self.last_frames = np.zeros(n, dtype=np.int64)
+        self.episodes = 0
+        # Enemy slots, one row per world
+        self.cars = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros((n, 0))
+        self.y = np.zeros((n, 0))
+        self.speed = np.zeros((n, 0))
+        self.lane = np.zeros((n, 0), dtype=np.int8)
+        self._all = np.arange(n)
+        self.reset()
+
+    def reset(self):
+        self._reset_worlds(self._all)
+        return self.observe()
+
+    def _reset_worlds(self, worlds):
+        self.player_x[worlds] = PLAYER_START_X
+        self.score[worlds] = 0
+        self.level[worlds] = 0
+        self.frames[worlds] = 0
+        self.just_leveled_up[worlds] = False
+        self._setup_level(worlds)
+
+    def _grow(self, capacity):
+        """Room for capacity cars in every world"""
+        extra = capacity - self.x.shape[1]
+        if extra <= 0:
+            return
+        n = self.num_worlds
+        self.x = np.hstack([self.x, np.zeros((n, extra))])
+        self.y = np.hstack([self.y, np.full((n, extra), PARKED_Y)])
+        self.speed = np.hstack([self.speed, np.zeros((n, extra))])
+        self.lane = np.hstack([self.lane, np.zeros((n, extra), dtype=np.int8)])
+
+    def _setup_level(self, worlds):
+        """setup_level for the given worlds at their current level"""
+        rng = self.rng
+        level = self.level[worlds]
+        extra_cars = level // 5
+        count = random_ints(rng, self.base_min_cars + extra_cars, self.base_max_cars + extra_cars,
+                            len(worlds)).astype(np.int64)
+        self._grow(int(count.max(initial=0)))
+        growth = self.speed_growth ** level
+        self.lane_speeds[worlds] = np.column_stack([6 * growth, 2 * growth])
+        self.cars[worlds] = count
+
+        # Park every slot, then fill the first count of each world
+        self.y[worlds] = PARKED_Y
+        self.speed[worlds] = 0
+        slot = np.arange(self.x.shape[1])
+        rows, cols = np.nonzero(slot < count[:, None])
+        w = worlds[rows]
+        lane = np.where(rng.random(len(w)) < 0.5, LEFT_LANE, RIGHT_LANE)
+        self.lane[w, cols] = lane
+        self.x[w, cols] = random_ints(rng, SETUP_X_LOW[lane], SETUP_X_HIGH[lane], len(w))
+        self.y[w, cols] = random_ints(rng, -300, -50, len(w))
+        self.speed[w, cols] = self.lane_speeds[w, lane]
+
+    def step(self, actions):
+        """Advance every world one frame, returns (observations, rewards, dones)"""
+        actions = np.asarray(actions)
+        prev_x = self.player_x
+        x = prev_x.copy()
+        left = (actions & 1) != 0
+        right = (actions & 2) != 0
+        x[left] = np.maximum(PLAYER_X_MIN, x[left] - PLAYER_SPEED)
+        x[right] = np.minimum(PLAYER_X_MAX, x[right] + PLAYER_SPEED)
+        self.player_x = x
+
+        y_from = self.y
+        y_to = y_from + self.speed
+        crashed = self._collisions(prev_x, x, y_from, y_to)
+        self.y = y_to
+
+        # Past the bottom of the screen means a respawn in the same lane, and a point
+        rows, cols = np.nonzero(y_to > HEIGHT)
+        points = np.bincount(rows, minlength=self.num_worlds)
+        if len(rows):
+            n = len(rows)
+            lane = self.lane[rows, cols]
+            self.y[rows, cols] = random_ints(self.rng, -300, -50, n)
+            self.x[rows, cols] = random_ints(self.rng, RESPAWN_X_LOW[lane], RESPAWN_X_HIGH[lane], n)
+            self.speed[rows, cols] = self.lane_speeds[rows, lane]
+            self.score += points
+        self.frames += 1
+        self._check_level_up()
+
+        rewards = points.astype(np.float32)
+        rewards[crashed] += self.crash_reward
+        dones = crashed
+        if self.max_frames is not None:
+            dones = dones | (self.frames >= self.max_frames)
+        finished = np.flatnonzero(dones)
+        if len(finished):
+            self.last_score[finished] = self.score[finished]
+            self.last_frames[finished] = self.frames[finished]
+            self.episodes += len(finished)
+            self._reset_worlds(finished)
+        return self.observe(), rewards, dones
+
+    def _collisions(self, prev_x, x, y_from, y_to):
+        """swept_collision for every world, over only the cars crossing the player's rows"""
+        rows, cols = np.nonzero((y_to > PLAYER_Y - CAR_HEIGHT) & (y_from < PLAYER_Y + CAR_HEIGHT))
+        crashed = np.zeros(self.num_worlds, dtype=bool)
+        if not len(rows):
+            return crashed
+        car_x = self.x[rows, cols]
+        start = y_from[rows, cols]
+        dy = y_to[rows, cols] - start
+        enter = (PLAYER_Y - CAR_HEIGHT - start) / dy
+        leave = (PLAYER_Y + CAR_HEIGHT - start) / dy
+
+        prev = prev_x[rows]
+        dx = x[rows] - prev
+        moving = dx != 0
+        step_dx = np.where(moving, dx, 1.0)
+        t_a = (car_x - CAR_WIDTH - prev) / step_dx
+        t_b = (car_x + CAR_WIDTH - prev) / step_dx
+        enter = np.where(moving, np.maximum(enter, np.minimum(t_a, t_b)), enter)
+        leave = np.where(moving, np.minimum(leave, np.maximum(t_a, t_b)), leave)
+        # Standing still: plain horizontal overlap for the whole step
+        overlap = moving | ((car_x - CAR_WIDTH < prev) & (prev < car_x + CAR_WIDTH))
+        hit = overlap & (np.maximum(enter, 0.0) < np.minimum(leave, 1.0))
+        crashed[rows[hit]] = True
+        return crashed
+
+    def _check_level_up(self):
+        level_score = self.level_score
+        up = (self.score > 0) & (self.score % level_score == 0) & ~self.just_leveled_up
+        self.just_leveled_up[~up & (self.score % (level_score // 2 or 1) != 0)] = False
+        worlds = np.flatnonzero(up)
+        if len(worlds):
+            self.just_leveled_up[worlds] = True
+            self.level[worlds] += 1
+            self._setup_level(worlds)
+
+    def observe(self):
+        k = self.observed_cars
+        n = self.num_worlds
+        obs = np.zeros((n, 2 + 4 * k), dtype=np.float32)
+        obs[:, 0] = self.player_x
+        obs[:, 1] = self.level
+        if not k or not self.x.shape[1]:
+            return obs
+        # Cars not yet past the player, nearest (lowest on screen) first
+        ahead = (self.y < PLAYER_Y + CAR_HEIGHT) & (self.y > PARKED_Y)
+        order = np.argsort(np.where(ahead, -self.y, np.inf), axis=1)[:, :k]
+        picked = np.take_along_axis
+        present = picked(ahead, order, axis=1)
+        cars = np.stack([
+            present,
+            picked(self.x, order, axis=1) - self.player_x[:, None],
+            picked(self.y, order, axis=1),
+            picked(self.speed, order, axis=1)
+        ], axis=2) * present[:, :, None]
+        obs[:, 2:2 + cars.shape[1] * 4] = cars.reshape(n, -1)
+        return obs
+
+
+if __name__ == "__main__":
+    # Throughput check: python vec_env.py
+    for worlds in (1, 64, 1024, 8192):
+        env = VecEnv(worlds, seed=1)
+        rng = np.random.default_rng(2)
+        actions = rng.integers(0, 4, size=(64, worlds))
+        steps = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < 2:
+            env.step(actions[steps % 64])
+            steps += 1
+        elapsed = time.perf_counter() - start
+        rate = steps * worlds / elapsed
+        print(f"{worlds:5} worlds: {rate:12,.0f} world-steps/s ({rate * 60 / 1e6:,.1f}M per minute), "
+              f"{env.episodes} episodes")